@@ -0,0 +1,159 @@
+# Разбор кадров рисунка вне GUI-потока.
+# Поток чтения (ClientThread) только кладёт кадры в очередь, PNG распаковывается здесь,
+# а GUI-поток забирает готовые картинки и штрихи пачкой и дорисовывает их в свой холст.
+# Картинка всего холста (кадр I) перекрывает всё, что пришло до неё, поэтому
+# кадры, которые ещё не успели разобрать или нарисовать, при этом выбрасываются.
+#
+# Кадры плиток (TILES, см. tiles.py) ссылаются на картинки по хешу: картинки держим в кэше,
+# а тех, что нет, просим у сервера через request_tiles и рисуем, когда придёт ответ.
+# Картинки в любом из этих кадров - PNG или с палитрой комнаты (indexed.py, кадр PALETTE).
+import threading
+from collections import deque
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QImage
+
+from protocol import IMAGE, STROKE, DELTA, TILES, PALETTE, unpack_delta, decode_stroke
+from indexed import is_indexed, decode_indexed, unpack_palette
+from canvas import scale_stroke
+from tiles import TILE_SIZE, NO_POSITION, CLIENT_CACHE_TILES, TileCache, unpack_tiles, pack_tile_request
+
+
+class CanvasDecoder(QObject):
+    updated = pyqtSignal()  # Появились готовые изменения холста, забирать через take()
+
+    def __init__(self, request_tiles=None):
+        super().__init__()
+        self.request_tiles = request_tiles  # Отправить серверу кадр запроса плиток
+        self.tiles = TileCache(CLIENT_CACHE_TILES)  # Хеш -> QImage плитки
+        self.wanted = {}  # (столбец, строка) -> хеш, картинку которого ждём от сервера
+        # Штрихи приходят в логических координатах, а холст - в разрешении картинок комнаты
+        self.stroke_scale = (1.0, 1.0)
+        self.colors = []  # Палитра комнаты для картинок с палитрой
+        self.frames = deque()  # Кадры, ждущие разбора: (тип, данные)
+        self.ready = deque()  # Разобранные: ("image", QImage), ("delta", x, y, QImage), ("stroke", штрих)
+        self.generation = 0  # Растёт с каждым кадром I: всё, что разбиралось до него, устарело
+        self.condition = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def submit(self, frame_type, payload):
+        # Вызывается из потока чтения; payload - уже копия (bytes)
+        with self.condition:
+            if frame_type == PALETTE:
+                # Сразу, а не в очереди: кадр I выбросил бы её вместе с устаревшими картинками.
+                # Палитра только растёт, поэтому картинкам, которые ещё в очереди, она тоже годится
+                self.colors = unpack_palette(payload)
+                return
+            if frame_type == IMAGE:
+                self.frames.clear()
+                self.ready.clear()
+                self.generation += 1
+            self.frames.append((frame_type, payload))
+            self.condition.notify()
+
+    def set_canvas_size(self, logical, network):
+        # Вызывается из потока чтения по кадру V, до первого кадра рисунка
+        with self.condition:
+            self.stroke_scale = (network[0] / logical[0], network[1] / logical[1])
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.frames:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                frame_type, payload = self.frames.popleft()
+                generation = self.generation
+            try:
+                updates = self.decode(frame_type, payload)
+            except Exception as e:
+                print(f"Ошибка разбора кадра: {e}")
+                continue
+            if not updates:
+                continue
+            with self.condition:
+                if generation != self.generation:
+                    continue  # Пока разбирали, пришёл весь холст
+                notify = not self.ready
+                self.ready.extend(updates)
+            # Один сигнал на пачку: пока GUI не забрал изменения, новых сигналов не шлём
+            if notify:
+                self.updated.emit()
+
+    def decode(self, frame_type, payload):
+        # Список изменений холста
+        if frame_type == STROKE:
+            return [("stroke", scale_stroke(decode_stroke(payload), *self.stroke_scale))]
+        if frame_type == IMAGE:
+            self.wanted.clear()  # Весь холст перекрывает плитки, которых ещё ждём
+            image = self.load_image(payload)
+            if image.isNull():
+                print("Ошибка загрузки изображения")
+                return []
+            return [("image", image)]
+        if frame_type == DELTA:
+            x, y, image_data = unpack_delta(payload)
+            image = self.load_image(image_data)
+            if image.isNull():
+                print("Ошибка загрузки изображения")
+                return []
+            return [("delta", x, y, image)]
+        if frame_type == TILES:
+            return self.decode_tiles(payload)
+        return []
+
+    def load_image(self, data):
+        with self.condition:
+            colors = self.colors
+        if is_indexed(data):
+            return decode_indexed(data, colors)
+        return QImage.fromData(data)
+
+    def decode_tiles(self, payload):
+        updates = []
+        missing = []
+        for col, row, digest, data in unpack_tiles(payload):
+            image = None
+            if data:
+                image = self.load_image(data)
+                if image.isNull():
+                    print("Ошибка загрузки изображения")
+                    continue
+                self.tiles.put(digest, image)
+            if col == NO_POSITION:
+                # Ответ на запрос: рисуем там, где эту плитку ещё ждут
+                for position, wanted in list(self.wanted.items()):
+                    if wanted == digest:
+                        del self.wanted[position]
+                        updates.append(("delta", position[0] * TILE_SIZE, position[1] * TILE_SIZE, image))
+                continue
+            if image is None:
+                image = self.tiles.get(digest)
+            if image is None:
+                if digest not in self.wanted.values():
+                    missing.append(digest)
+                self.wanted[(col, row)] = digest
+                continue
+            # Пришла новая плитка на это место - старой, если её ещё ждали, уже не нужно
+            self.wanted.pop((col, row), None)
+            updates.append(("delta", col * TILE_SIZE, row * TILE_SIZE, image))
+        if missing and self.request_tiles is not None:
+            self.request_tiles(pack_tile_request(missing))
+        return updates
+
+    def take(self):
+        # Вызывается из GUI-потока по сигналу updated
+        with self.condition:
+            updates = list(self.ready)
+            self.ready.clear()
+        return updates
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
@@ -0,0 +1,80 @@
+# Приём живого канала (live.py): курсор и заготовка фигуры ведущего по UDP.
+# Свой поток ждёт датаграммы и оставляет только самое новое состояние,
+# окно забирает его по сигналу updated и рисует поверх холста.
+import socket
+import threading
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from live import pack_hello, unpack_state, is_newer, LIVE_KEEPALIVE, MAX_DATAGRAM
+
+
+class LiveReceiver(QObject):
+    updated = pyqtSignal()  # Пришло новое состояние, забирать через take()
+
+    def __init__(self):
+        super().__init__()
+        self.sock = None
+        self.server = None  # Адрес UDP сервера
+        self.token = None
+        self.last_seq = None
+        self.state = None
+        self.pending = False  # Состояние ещё не забрали
+        self.stale = 0  # Сколько датаграмм пришло не по порядку и выброшено
+        self.lock = threading.Lock()
+        self.running = False
+
+    def start(self, host, port, token):
+        # Вызывается из потока чтения, когда сервер ответил кадром LIVE
+        self.server = (host, port)
+        self.token = token
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Раз в LIVE_KEEPALIVE секунд тишины напоминаем серверу о себе
+        self.sock.settimeout(LIVE_KEEPALIVE)
+        self.running = True
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        sock = self.sock
+        try:
+            sock.sendto(pack_hello(self.token), self.server)
+            while self.running:
+                try:
+                    data, addr = sock.recvfrom(MAX_DATAGRAM)
+                except socket.timeout:
+                    sock.sendto(pack_hello(self.token), self.server)
+                    continue
+                if addr[1] != self.server[1]:
+                    continue
+                try:
+                    seq, state = unpack_state(data)
+                except Exception:
+                    continue  # Битая датаграмма
+                with self.lock:
+                    if not is_newer(seq, self.last_seq):
+                        self.stale += 1
+                        continue
+                    self.last_seq = seq
+                    self.state = state
+                    notify = not self.pending
+                    self.pending = True
+                if notify:
+                    self.updated.emit()
+        except OSError:
+            pass  # Сокет закрыт в stop()
+
+    def take(self):
+        # Вызывается из GUI-потока по сигналу updated
+        with self.lock:
+            self.pending = False
+            return self.state
+
+    def stop(self):
+        self.running = False
+        sock, self.sock = self.sock, None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)  # Будит поток в recvfrom
+            except OSError:
+                pass
+            sock.close()
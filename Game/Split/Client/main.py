@@ -1,59 +1,81 @@
+import os
 import sys
 import socket
+import threading
 from datetime import datetime
 from PyQt6.QtWidgets import (QApplication, QWidget, QPushButton, QVBoxLayout,
                              QLabel, QTextEdit, QMessageBox, QInputDialog,
                              QLineEdit, QHBoxLayout)
-from PyQt6.QtCore import Qt, QPoint, QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QPoint, QRect, QRectF, QSize, QThread, pyqtSignal
 from PyQt6.QtGui import QColor, QPainter, QImage, QPen, QBrush
 
-def recvall(sock, n):
-    data = b''
-    while len(data) < n:
-        packet = sock.recv(n - len(data))
-        if not packet:
-            return None
-        data += packet
-    return data
+# Общие для сервера и клиента модули лежат уровнем выше (Game/Split)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from framing import FrameReader, send_frame, pack_frame
+from protocol import TEXT, IMAGE, STROKE, DELTA, TILES, PALETTE, CAPS, LIVE, CANVAS, pack_text, make_handshake, parse_capabilities, \
+    unpack_canvas_size, encode_stroke
+from compression import FrameCodec, SUPPORTED
+from strokes import paint_stroke, stroke_rect, draw_stroke
+from canvas_decoder import CanvasDecoder
+from live import LIVE_CHANNEL, NO_CURSOR, unpack_offer
+from live_receiver import LiveReceiver
+from canvas import CANVAS_WIDTH, CANVAS_HEIGHT, scale_stroke
+
+# Сколько первых мест топа помещается в поле с ником
+TOP_SHOWN = 3
 
 class ClientThread(QThread):
     message_received = pyqtSignal(str)
-    image_received = pyqtSignal(bytes)
+    # Кадр V: логический размер холста и размер картинок. Сигнал уходит раньше, чем поток
+    # разбора получит следующие кадры, поэтому окно узнает размер до первых картинок
+    canvas_size_received = pyqtSignal(int, int, int, int)
 
-    def __init__(self, host, port, nickname):
+    def __init__(self, host, port, nickname, room=""):
         super().__init__()
         self.host = host
         self.port = port
         self.nickname = nickname
+        self.room = room
         self.client_socket = None
         self.running = False
+        self.codec = FrameCodec()  # Сжатие включится, когда сервер ответит кадром C
+        # Пишут в сокет окно (чат) и поток разбора рисунка (запросы плиток)
+        self.send_lock = threading.Lock()
+        # Кадры рисунка разбираются в своём потоке, готовое забирает окно по сигналу decoder.updated
+        self.decoder = CanvasDecoder(request_tiles=self.send)
+        # Курсор ведущего по UDP; включится, если сервер ответит кадром LIVE
+        self.live = LiveReceiver()
 
     def run(self):
         self.running = True
+        self.decoder.start()
         try:
             self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.client_socket.connect((self.host, self.port))
-            # Отправляем ник как обычный текст (начальное рукопожатие)
-            self.client_socket.send(f"Ник: {self.nickname}".encode())
+            # Отправляем ник, комнату, поддерживаемое сжатие и живой канал как обычный текст (начальное рукопожатие)
+            self.client_socket.send(make_handshake(self.nickname, self.room, SUPPORTED, LIVE_CHANNEL))
             self.message_received.emit(f"Подключение к серверу {self.port} установлено!")
+            reader = FrameReader(self.client_socket)
             while self.running:
-                type_byte = recvall(self.client_socket, 1)
-                if type_byte is None:
-                    self.message_received.emit("Сервер закрыл соединение.")
-                    break
-                length_bytes = recvall(self.client_socket, 4)
-                if length_bytes is None:
-                    self.message_received.emit("Сервер закрыл соединение.")
-                    break
-                msg_length = int.from_bytes(length_bytes, 'big')
-                payload = recvall(self.client_socket, msg_length)
-                if payload is None:
+                frame = reader.read_frame()
+                if frame is None:
                     self.message_received.emit("Сервер закрыл соединение.")
                     break
-                if type_byte == b'T':
-                    self.message_received.emit(payload.decode())
-                elif type_byte == b'I':
-                    self.image_received.emit(payload)
+                # payload - memoryview на буфер читателя, дальше отдаём копию
+                type_byte, payload = self.codec.decode(*frame)
+                if type_byte == CAPS:
+                    self.codec.enable(parse_capabilities(payload))
+                elif type_byte == CANVAS:
+                    logical, network = unpack_canvas_size(payload)
+                    self.decoder.set_canvas_size(logical, network)
+                    self.canvas_size_received.emit(*logical, *network)
+                elif type_byte == LIVE:
+                    port, token = unpack_offer(payload)
+                    self.live.start(self.host, port, token)
+                elif type_byte == TEXT:
+                    self.message_received.emit(str(payload, 'utf-8'))
+                elif type_byte in (IMAGE, STROKE, DELTA, TILES, PALETTE):
+                    self.decoder.submit(type_byte, bytes(payload))
         except Exception as e:
             self.message_received.emit(f"Ошибка: {e}")
         finally:
@@ -61,51 +83,149 @@ class ClientThread(QThread):
                 self.client_socket.close()
                 self.client_socket = None
 
+    def send(self, frame):
+        with self.send_lock:
+            client_socket = self.client_socket
+            if client_socket:
+                send_frame(client_socket, self.codec.encode(frame))
+
     def send_message(self, message):
-        if self.client_socket:
-            try:
-                data = b'T' + len(message.encode()).to_bytes(4, 'big') + message.encode()
-                self.client_socket.sendall(data)
-            except Exception as e:
-                self.message_received.emit(f"Ошибка при отправке сообщения: {e}")
+        try:
+            self.send(pack_text(message))
+        except Exception as e:
+            self.message_received.emit(f"Ошибка при отправке сообщения: {e}")
+
+    def send_stroke(self, stroke):
+        # Штрих игрока, которому сервер отдал холст в этом раунде
+        try:
+            self.send(pack_frame(STROKE, encode_stroke(stroke)))
+        except Exception as e:
+            self.message_received.emit(f"Ошибка при отправке рисунка: {e}")
 
     def stop(self):
         self.running = False
-        if self.client_socket:
-            self.client_socket.close()
-            self.client_socket = None
+        self.decoder.stop()
+        self.live.stop()
+        client_socket, self.client_socket = self.client_socket, None
+        if client_socket:
+            try:
+                # shutdown будит поток, который ждёт данных в recv
+                client_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client_socket.close()
 
 class DrawArea(QLabel):
+    # Отрезок, который нарисовал игрок, в логических координатах (когда холст отдан ему)
+    stroke_drawn = pyqtSignal(object)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setStyleSheet("background-color: #ffffff; border: 3px solid #7f8c8d; border-radius: 15px;")
         self.drawing = False
         self.last_point = QPoint()
-        self.image = QImage(self.size(), QImage.Format.Format_ARGB32)
+        # Размер холста задаёт сервер: картинки приходят в разрешении комнаты, окно их только растягивает
+        self.image = QImage(CANVAS_WIDTH, CANVAS_HEIGHT, QImage.Format.Format_ARGB32)
+        self.logical_size = QSize(CANVAS_WIDTH, CANVAS_HEIGHT)  # В нём координаты курсора ведущего
         self.image.fill(Qt.GlobalColor.white)
         self.pen_size = 5
         self.current_color = QColor(Qt.GlobalColor.black)
         self.eraser_mode = False
+        self.live_state = None  # Курсор и заготовка фигуры ведущего (live.py), рисуются поверх холста
         self.setEnabled(False)
 
     def clear_canvas(self):
         self.image.fill(Qt.GlobalColor.white)
         self.update()
 
+    def set_canvas_size(self, logical_size, network_size):
+        self.logical_size = logical_size
+        if network_size != self.image.size():
+            self.image = QImage(network_size, QImage.Format.Format_ARGB32)
+            self.image.fill(Qt.GlobalColor.white)
+            self.update()
+
+    def set_live_state(self, state):
+        # Из логических координат - в координаты холста
+        sx = self.image.width() / max(self.logical_size.width(), 1)
+        sy = self.image.height() / max(self.logical_size.height(), 1)
+        if state is not None and (sx != 1 or sy != 1):
+            cursor = (NO_CURSOR, NO_CURSOR) if state.x == NO_CURSOR else (round(state.x * sx), round(state.y * sy))
+            state = state._replace(x=cursor[0], y=cursor[1], size=max(round(state.size * sx), 1),
+                                   preview=scale_stroke(state.preview, sx, sy) if state.preview else None)
+        # Перерисовываем только там, где курсор и заготовка были и где они теперь
+        for old_or_new in (self.live_state, state):
+            if old_or_new is not None:
+                self.update(self.image_to_widget(self.live_rect(old_or_new)).adjusted(-2, -2, 2, 2))
+        self.live_state = state
+
+    def live_rect(self, state):
+        rect = QRect()
+        if state.x != NO_CURSOR:
+            radius = state.size // 2 + 2
+            rect = QRect(state.x - radius, state.y - radius, 2 * radius, 2 * radius)
+        if state.preview:
+            rect = rect.united(stroke_rect(state.preview, self.image))
+        return rect
+
+    def apply_updates(self, updates):
+        # Дорисовываем разобранные кадры (см. CanvasDecoder) в тот же холст
+        # и перерисовываем только изменившуюся область
+        dirty = QRect()
+        for update in updates:
+            if update[0] == "stroke":
+                paint_stroke(self.image, update[1])
+                dirty = dirty.united(stroke_rect(update[1], self.image))
+                continue
+            if update[0] == "image":
+                x, y, image = 0, 0, update[1]
+                if image.size() != self.image.size():
+                    # Сервер без кадра V: холст в разрешении его картинок
+                    self.image = QImage(image.size(), QImage.Format.Format_ARGB32)
+                    self.image.fill(Qt.GlobalColor.white)
+                    dirty = self.image.rect()
+            else:
+                _, x, y, image = update
+            painter = QPainter(self.image)
+            painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+            painter.drawImage(QPoint(x, y), image)
+            painter.end()
+            dirty = dirty.united(QRect(x, y, image.width(), image.height()).intersected(self.image.rect()))
+        if not dirty.isEmpty():
+            self.update(self.image_to_widget(dirty))
+
+    def image_to_widget(self, rect):
+        # Холст растягивается на весь виджет; переводим область холста в координаты виджета
+        sx = self.width() / max(self.image.width(), 1)
+        sy = self.height() / max(self.image.height(), 1)
+        return QRectF(rect.x() * sx, rect.y() * sy, rect.width() * sx, rect.height() * sy).toAlignedRect()
+
+    def to_logical(self, event):
+        # Точка окна -> логическая точка холста: в ней штрихи идут по сети (canvas.py)
+        position = event.position()
+        return QPoint(int(position.x() * self.logical_size.width() / max(self.width(), 1)),
+                      int(position.y() * self.logical_size.height() / max(self.height(), 1)))
+
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton and self.isEnabled():
             self.drawing = True
-            self.last_point = event.position().toPoint()
+            self.last_point = self.to_logical(event)
 
     def mouseMoveEvent(self, event):
         if self.drawing and self.isEnabled():
-            painter = QPainter(self.image)
-            pen = QPen(Qt.GlobalColor.white if self.eraser_mode else self.current_color, self.pen_size)
-            painter.setPen(pen)
-            current_point = event.position().toPoint()
-            painter.drawLine(self.last_point, current_point)
+            current_point = self.to_logical(event)
+            if self.eraser_mode:
+                stroke = {"k": "eraser", "w": self.pen_size}
+            else:
+                stroke = {"k": "pen", "c": self.current_color.name(), "w": self.pen_size}
+            stroke["p"] = [self.last_point.x(), self.last_point.y(), current_point.x(), current_point.y()]
             self.last_point = current_point
-            self.update()
+            # У себя рисуем так же, как этот штрих нарисуют остальные
+            local = scale_stroke(stroke, self.image.width() / max(self.logical_size.width(), 1),
+                                 self.image.height() / max(self.logical_size.height(), 1))
+            paint_stroke(self.image, local)
+            self.update(self.image_to_widget(stroke_rect(local, self.image)))
+            self.stroke_drawn.emit(stroke)
 
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton and self.isEnabled():
@@ -114,28 +234,48 @@ class DrawArea(QLabel):
     def paintEvent(self, event):
         super().paintEvent(event)
         painter = QPainter(self)
-        painter.drawImage(self.rect(), self.image, self.image.rect())
+        # Перерисовываем только запрошенную область, а не масштабируем весь холст
+        target = event.rect()
+        sx = self.image.width() / max(self.width(), 1)
+        sy = self.image.height() / max(self.height(), 1)
+        source = QRectF(target.x() * sx, target.y() * sy, target.width() * sx, target.height() * sy)
+        painter.drawImage(QRectF(target), self.image, source)
+        if self.live_state is not None:
+            self.paint_live(painter)
         painter.setBrush(QBrush(self.current_color))
         painter.drawEllipse(10, 10, 30, 30)
 
-    def resizeEvent(self, event):
-        new_image = QImage(self.size(), QImage.Format.Format_ARGB32)
-        new_image.fill(Qt.GlobalColor.white)
-        painter = QPainter(new_image)
-        painter.drawImage(QPoint(0, 0), self.image)
-        self.image = new_image
-        super().resizeEvent(event)
+    def paint_live(self, painter):
+        # В координатах холста, как у ведущего, и растягиваем вместе с холстом
+        state = self.live_state
+        painter.save()
+        painter.scale(self.width() / max(self.image.width(), 1), self.height() / max(self.image.height(), 1))
+        if state.preview:
+            draw_stroke(painter, state.preview)
+        if state.x != NO_CURSOR:
+            # Кружок размером с перо, с тёмной обводкой, чтобы было видно и белый ластик
+            painter.setPen(QPen(QColor(Qt.GlobalColor.darkGray), 1))
+            painter.setBrush(QBrush(QColor(state.color)))
+            radius = max(state.size // 2, 2)
+            painter.drawEllipse(QPoint(state.x, state.y), radius, radius)
+        painter.restore()
+
 
 class StartWindow(QWidget):
-    def __init__(self, host, port, nickname):
+    def __init__(self, host, port, nickname, room=""):
         super().__init__()
         self.host = host
         self.port = port
         self.nickname = nickname
+        self.room = room
+        self.top_places = {}  # Место -> строка топа; сервер присылает весь топ при входе, потом только изменения
         self.initUI()
-        self.client_thread = ClientThread(self.host, self.port, self.nickname)
+        self.client_thread = ClientThread(self.host, self.port, self.nickname, self.room)
         self.client_thread.message_received.connect(self.update_chat)
-        self.client_thread.image_received.connect(self.update_image)
+        self.client_thread.decoder.updated.connect(self.update_canvas)
+        self.client_thread.live.updated.connect(self.update_live)
+        self.client_thread.canvas_size_received.connect(self.set_canvas_size)
+        self.squareDraw.stroke_drawn.connect(self.client_thread.send_stroke)
         self.client_thread.start()
 
     def initUI(self):
@@ -146,7 +286,7 @@ class StartWindow(QWidget):
         self.squareChat.setGeometry(25, 225, 250, 400)
         self.squareChat.setStyleSheet(
             "background-color: #34495e; border: 2px solid #7f8c8d; border-radius: 10px; padding: 10px; font-family: 'Arial'; font-size: 14px;")
-        self.squareTop = QLabel(f"Ник: {self.nickname}\nСервер: {self.host}:{self.port}", self)
+        self.squareTop = QLabel(self.identity_text(), self)
         self.squareTop.setGeometry(25, 25, 250, 175)
         self.squareTop.setStyleSheet(
             "background-color: #34495e; border: 2px solid #7f8c8d; border-radius: 10px; padding: 10px; font-size: 16px;")
@@ -170,21 +310,47 @@ class StartWindow(QWidget):
     def get_timestamp(self):
         return f"[{datetime.now().strftime('%H:%M:%S')}] "
 
+    def identity_text(self):
+        return f"Ник: {self.nickname}\nСервер: {self.host}:{self.port}\nКомната: {self.room or 'main'}"
+
+    def update_top_places(self, message):
+        # "Топ игроков:" - весь топ, "Топ игроков (изменения):" - только сдвинувшиеся места
+        title, _, lines = message.partition("\n")
+        if title == "Топ игроков:":
+            self.top_places = {}
+        for line in lines.splitlines():
+            place = line.partition(". ")[0]
+            if place.isdigit():
+                self.top_places[int(place)] = line
+        # В поле помещаются первые места, весь топ остаётся в чате
+        shown = [self.top_places[place] for place in sorted(self.top_places)[:TOP_SHOWN]]
+        self.squareTop.setText("\n".join([self.identity_text(), ""] + shown))
+
     def update_chat(self, message):
         self.squareChat.append(self.get_timestamp() + message)
+        if message.startswith("Топ игроков"):
+            self.update_top_places(message)
+        # Сервер без окна (headless.py) отдаёт холст игроку на раунд
+        if message.startswith("Ваше слово: "):
+            self.squareDraw.setEnabled(True)
+        elif message.startswith("Новый раунд!") or message.startswith("Загаданное слово:"):
+            self.squareDraw.drawing = False
+            self.squareDraw.setEnabled(False)
         if message.startswith("Загаданное слово:"):
             QMessageBox.information(self, "Игра окончена", message)
             self.squareDraw.clear_canvas()  # Очистка холста
             self.squareChat.clear()  # Очищаем чат после завершения раунда
             self.squareChat.append("Ожидание нового слова...")
 
-    def update_image(self, image_data):
-        image = QImage()
-        if not image.loadFromData(image_data):
-            print("Ошибка загрузки изображения")
-            return
-        self.squareDraw.image = image
-        self.squareDraw.update()
+    def update_canvas(self):
+        # Картинки уже разобраны в потоке CanvasDecoder, здесь только дорисовка
+        self.squareDraw.apply_updates(self.client_thread.decoder.take())
+
+    def set_canvas_size(self, width, height, network_width, network_height):
+        self.squareDraw.set_canvas_size(QSize(width, height), QSize(network_width, network_height))
+
+    def update_live(self):
+        self.squareDraw.set_live_state(self.client_thread.live.take())
 
     def send_message(self):
         message = self.message_input.text()
@@ -246,7 +412,11 @@ class MainWindow(QWidget):
         if not ok or not nickname:
             QMessageBox.warning(self, "Ошибка", "Ник не может быть пустым!")
             return
-        self.start_window = StartWindow(host, port, nickname)
+        # Пустая комната - общая комната ведущего
+        room, ok = QInputDialog.getText(self, "Комната", "Комната (пусто - основная):")
+        if not ok:
+            return
+        self.start_window = StartWindow(host, port, nickname, room.strip())
         self.start_window.show()
         self.close()
 
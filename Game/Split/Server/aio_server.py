@@ -0,0 +1,103 @@
+# Сервер на asyncio: все соединения обслуживает один поток с циклом событий,
+# без отдельного потока на каждого клиента. Протокол и логика игры те же,
+# что у сервера на потоках: игра вызывается через методы GameServer.
+import asyncio
+import time
+
+from framing import HEADER, check_length
+from protocol import TEXT, STROKE, TILES, parse_handshake
+from outbox import ClientConnection, OUTBOX_LINGER
+import metrics
+
+
+class AsyncClientConnection(ClientConnection):
+    # Та же очередь с лимитом, что у ClientConnection, но пишет в сокет корутина в цикле событий.
+    # send() можно вызывать из любого потока (например, из кодировщика кадров).
+    def __init__(self, stream, nickname, loop, on_event=None):
+        self.stream = stream
+        self.loop = loop
+        self.wakeup = asyncio.Event()
+        super().__init__(None, nickname, on_event=on_event)
+
+    def start_writer(self):
+        self.writer_task = self.loop.create_task(self.write_loop())
+
+    def wake_writer(self):
+        self.call_in_loop(self.wakeup.set)
+
+    def call_in_loop(self, callback):
+        try:
+            self.loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass  # Цикл событий уже остановлен
+
+    async def write_loop(self):
+        while True:
+            with self.condition:
+                if self.closed:
+                    return
+                frames = self.take_batch() if self.frames else None
+                if frames is None:
+                    self.wakeup.clear()
+            if frames is None:
+                await self.wakeup.wait()
+                if OUTBOX_LINGER:
+                    await asyncio.sleep(OUTBOX_LINGER)  # Ждём остальные кадры всплеска (см. outbox.py)
+                continue
+            try:
+                # Пачка кадров - одна запись в транспорт и одно ожидание drain
+                wire_frames = [self.codec.encode(frame) for frame in frames]
+                started = time.perf_counter()
+                self.stream.writelines([part for wire_frame in wire_frames for part in wire_frame])
+                await self.stream.drain()
+                self.record_sent(wire_frames, time.perf_counter() - started)
+            except Exception as e:
+                print(f"Ошибка отправки клиенту {self.nickname}: {e}")
+                self.close()
+                return
+            if not self.frames_sent(frames):
+                return
+
+    def close_transport(self):
+        self.call_in_loop(self.stream.close)
+
+
+async def serve(server, sock):
+    # server - GameServer, sock - уже открытый слушающий сокет
+    server.aio_loop = asyncio.get_running_loop()
+    server.aio_stopped = asyncio.Event()
+    aio_server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(server, reader, writer), sock=sock)
+    async with aio_server:
+        await server.aio_stopped.wait()
+
+
+async def handle_connection(server, reader, writer, handshake=None):
+    # handshake - уже прочитанное рукопожатие (когда соединение передал другой процесс, см. shard.py)
+    addr = writer.get_extra_info("peername")
+    # При подключении ожидаем, что клиент отправит свой ник (и комнату) в виде обычного текста
+    if handshake is None:
+        handshake = await reader.read(1024)
+    nickname, room_name, compression, live, relay = parse_handshake(handshake)
+    conn = AsyncClientConnection(writer, nickname, asyncio.get_running_loop(), on_event=server.client_event)
+    server.register_client(conn, addr, room_name, compression, live, relay)
+    try:
+        while server.running:
+            frame_type, msg_length = HEADER.unpack(await reader.readexactly(HEADER.size))
+            check_length(msg_length)
+            frame_type, payload = conn.codec.decode(frame_type, await reader.readexactly(msg_length))
+            metrics.FRAMES_RECEIVED.inc(chr(frame_type[0]))
+            if server.recorder:
+                server.recorder.client_frame(conn, frame_type, payload)
+            if frame_type == TEXT:
+                server.handle_text(conn, payload.decode().strip())
+            elif frame_type == STROKE:
+                server.handle_stroke(conn, payload)
+            elif frame_type == TILES:
+                server.handle_tile_request(conn, payload)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    except Exception as e:
+        server.log(conn.room, f"Ошибка: {e}")
+    finally:
+        server.remove_client(conn)
@@ -0,0 +1,199 @@
+# Рассылка рисунка вне GUI-потока.
+# GUI-поток только кладёт штрих или снимок холста в очередь и сразу возвращается,
+# PNG кодирует FrameEncoder, а отправкой занимаются очереди клиентов (outbox.py).
+# Все кадры рисунка проходят через журнал комнаты (canvas_log.py).
+import os
+import threading
+from collections import deque
+
+from PyQt6.QtCore import Qt, QBuffer, QIODevice, QRect, QRectF
+from PyQt6.QtGui import QColor
+
+from protocol import IMAGE, STROKE, pack_frame, pack_delta, encode_stroke
+from tiles import TILE_SIZE, tile_hash, pack_tiles
+from indexed import Palette, encode_indexed
+import metrics
+
+# Чем кодировать картинки холста: "png" или "indexed" - байт на пиксель с палитрой (indexed.py)
+CANVAS_ENCODING = os.environ.get("PICTIONARY_CANVAS_ENCODING", "png")
+
+
+def encode_png(image, rect=None):
+    with metrics.ENCODE_SECONDS.time("png"):
+        return _encode_png(image, rect)
+
+
+def _encode_png(image, rect):
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    if rect is not None:
+        image = image.copy(rect)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+class FrameEncoder(threading.Thread):
+    def __init__(self, room, on_compact=None):
+        super().__init__(daemon=True)
+        self.room = room  # Кадры получают только игроки этой комнаты
+        # on_compact() - журнал разросся, нужен снимок холста (submit_keyframe) из GUI-потока
+        self.on_compact = on_compact
+        self.jobs = deque()
+        self.condition = threading.Condition()
+        self.running = True
+        self.grid = {}  # (столбец, строка) -> хеш плитки, как у игроков (режим плиток)
+        # Палитра картинок; None - PNG (и после того, как цветов стало больше, чем в неё помещается)
+        self.palette = Palette() if CANVAS_ENCODING == "indexed" else None
+        self.new_colors = set()  # Цвета штрихов из GUI-потока, ещё не добавленные в палитру
+
+    def note_color(self, color):
+        # Цвет штриха, "#rrggbb"; в палитре он должен оказаться раньше картинки с ним
+        with self.condition:
+            self.new_colors.add(color)
+
+    def submit_stroke(self, stroke):
+        with self.condition:
+            self.jobs.append(("stroke", stroke, None))
+            self.condition.notify()
+
+    def submit_image(self, image, rect, tiles=False):
+        # image - снимок холста (QImage делит память с оригиналом до первой записи),
+        # rect - изменившаяся область; tiles - рассылать плитками (tiles.py), а не PNG куска
+        kind = "tiles" if tiles else "image"
+        with self.condition:
+            if self.jobs and self.jobs[-1][0] == kind:
+                # Старый снимок ещё не закодирован - заменяем его свежим
+                _, _, old_rect = self.jobs.pop()
+                rect = rect.united(old_rect)
+            self.jobs.append((kind, image, rect))
+            self.condition.notify()
+
+    def submit_keyframe(self, image, tiles=False):
+        # Новый опорный кадр журнала; игрокам не рассылается, у них холст уже такой
+        with self.condition:
+            self.jobs.append(("tile_keyframe" if tiles else "keyframe", image, None))
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.jobs:
+                    self.condition.wait()
+                if not self.running:
+                    break
+                kind, data, rect = self.jobs.popleft()
+            try:
+                if kind != "stroke":
+                    self.update_palette()
+                    data, rect = self.to_network(data, rect)
+                if kind == "stroke":
+                    self.publish_stroke(data)
+                elif kind == "image":
+                    self.encode_image(data, rect)
+                elif kind == "tiles":
+                    self.encode_tiles(data, rect)
+                elif kind == "tile_keyframe":
+                    self.room.canvas_log.reset(self.tile_frame(data, data.rect(), full=True))
+                else:
+                    self.room.canvas_log.reset(pack_frame(IMAGE, self.encode(data)))
+            except Exception as e:
+                print(f"Ошибка кодирования кадра: {e}")
+
+    def update_palette(self):
+        with self.condition:
+            colors, self.new_colors = self.new_colors, set()
+        if self.palette is None:
+            return
+        grew = False
+        for color in colors:
+            rgb = QColor(color).rgb()
+            if rgb in self.palette.index:
+                continue
+            if not self.palette.add(rgb):
+                self.palette = None  # Дальше только PNG; у игроков картинки любого вида рисуются одинаково
+                return
+            grew = True
+        if grew:
+            self.room.canvas_log.publish_palette(self.palette.frame())
+
+    def encode(self, image, rect=None):
+        if self.palette is None:
+            return encode_png(image, rect)
+        with metrics.ENCODE_SECONDS.time("indexed"):
+            return encode_indexed(image if rect is None else image.copy(rect), self.palette)
+
+    def to_network(self, image, rect):
+        # Снимок холста в разрешении картинок комнаты (canvas.py); rect переводим туда же
+        width, height = self.room.network_size
+        if image.width() == width and image.height() == height:
+            return image, rect
+        # Сглаживание даёт промежуточные цвета, которых нет в палитре, - с палитрой уменьшаем без него
+        mode = Qt.TransformationMode.FastTransformation if self.palette else Qt.TransformationMode.SmoothTransformation
+        scaled = image.scaled(width, height, Qt.AspectRatioMode.IgnoreAspectRatio, mode)
+        if rect is None or rect == image.rect():
+            return scaled, scaled.rect() if rect is not None else None
+        sx, sy = width / image.width(), height / image.height()
+        # Сглаживание задевает соседние пиксели - берём с запасом в пиксель
+        rect = QRectF(rect.x() * sx, rect.y() * sy, rect.width() * sx, rect.height() * sy).toAlignedRect()
+        return scaled, rect.adjusted(-1, -1, 1, 1).intersected(scaled.rect())
+
+    def publish_stroke(self, stroke):
+        compact = self.room.canvas_log.publish(pack_frame(STROKE, encode_stroke(stroke)),
+                                               keyframe=stroke["k"] == "clear")
+        if compact and self.on_compact:
+            self.on_compact()
+
+    def encode_image(self, image, rect):
+        if rect.isEmpty():
+            return
+        log = self.room.canvas_log
+        if rect == image.rect():
+            log.publish(pack_frame(IMAGE, self.encode(image)), keyframe=True)
+            return
+        # Кодируем только изменившийся кусок холста
+        if log.publish(pack_delta(rect.x(), rect.y(), self.encode(image, rect))):
+            # Весь холст уже под рукой - он и станет новым опорным кадром
+            log.reset(pack_frame(IMAGE, self.encode(image)))
+
+    def encode_tiles(self, image, rect):
+        if rect.isEmpty():
+            return
+        log = self.room.canvas_log
+        # Весь холст (очистка, новый раунд) - опорный кадр, в нём все плитки
+        full = rect == image.rect()
+        frame = self.tile_frame(image, rect, full)
+        if frame is not None and log.publish(frame, keyframe=full):
+            log.reset(self.tile_frame(image, image.rect(), full=True))
+
+    def tile_frame(self, image, rect, full=False):
+        # Плитки, которые задел rect. Неизменившиеся пропускаем (кроме full - там нужны все),
+        # PNG кладём только для хешей, которых ещё не было в комнате; в опорном кадре -
+        # для каждого хеша один раз, чтобы новый игрок собрал холст без запросов
+        store = self.room.tiles
+        sent = set()
+        entries = []
+        bounds = image.rect()
+        for row in range(rect.top() // TILE_SIZE, rect.bottom() // TILE_SIZE + 1):
+            for col in range(rect.left() // TILE_SIZE, rect.right() // TILE_SIZE + 1):
+                tile_rect = QRect(col * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE).intersected(bounds)
+                if tile_rect.isEmpty():
+                    continue
+                tile = image.copy(tile_rect)
+                digest = tile_hash(tile.width(), tile.height(), tile.constBits().asstring(tile.sizeInBytes()))
+                if not full and self.grid.get((col, row)) == digest:
+                    continue
+                self.grid[(col, row)] = digest
+                data = store.get(digest)
+                if data is None:
+                    data = self.encode(tile)
+                    store.put(digest, data)
+                elif not full or digest in sent:
+                    data = b""
+                sent.add(digest)
+                entries.append((col, row, digest, data))
+        return pack_tiles(entries) if entries else None
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
@@ -0,0 +1,128 @@
+# Состояние холста комнаты для тех, кто подключился посреди раунда (или потерял кадры):
+# последний опорный кадр (весь холст) и журнал кадров рисунка после него.
+# Новый игрок получает опорный кадр и журнал, а дальше - те же кадры, что и все.
+# Когда журнал разрастается, сервер снимает новый опорный кадр и журнал начинается заново,
+# поэтому подключение стоит одинаково, сколько бы ни шёл раунд.
+# Ретрансляторы (relay.py) держат такой же журнал у себя, поэтому опорные кадры получают
+# всегда, завёрнутыми в KEYFRAME: и разосланные всем, и снятые при сжатии журнала.
+import os
+import threading
+
+from framing import frame_size, pack_frame
+from protocol import STROKE, encode_stroke, pack_keyframe
+
+# После скольких байт (или кадров) журнала снимать новый опорный кадр
+LOG_BYTES = int(os.environ.get("PICTIONARY_LOG_BYTES", str(256 * 1024)))
+LOG_FRAMES = int(os.environ.get("PICTIONARY_LOG_FRAMES", "2000"))
+
+
+class CanvasLog:
+    def __init__(self, room, max_bytes=LOG_BYTES, max_frames=LOG_FRAMES):
+        self.room = room
+        self.max_bytes = max_bytes
+        self.max_frames = max_frames
+        self.keyframe = None  # Кадр I (или штрих "clear"); None - холст ещё пустой
+        self.palette = None  # Последний кадр PALETTE (indexed.py): нужен раньше любых картинок
+        self.frames = []  # Кадры S и D после опорного
+        self.log_bytes = 0
+        self.compacting = False  # Новый опорный кадр уже заказан
+        self.generation = 0  # Сколько раз менялся опорный кадр (см. mark)
+        # Журнал и рассылка меняются под одной блокировкой: кадр не может попасть
+        # ни в журнал без рассылки, ни в рассылку мимо журнала.
+        # RLock - под ней же сервер без окна меняет свой холст (headless.py)
+        self.lock = threading.RLock()
+
+    def publish(self, frame, keyframe=False, skip=None):
+        # Записывает кадр и рассылает его игрокам комнаты (кроме skip).
+        # keyframe=True - кадр сам задаёт весь холст (картинка целиком или очистка).
+        # Возвращает True, если пора снять новый опорный кадр (вызывающий делает это сам)
+        with self.lock:
+            if keyframe:
+                self.replace(frame)
+                compact = False
+            else:
+                self.frames.append(frame)
+                self.log_bytes += frame_size(frame)
+                compact = not self.compacting and (self.log_bytes > self.max_bytes
+                                                   or len(self.frames) > self.max_frames)
+                if compact:
+                    self.compacting = True
+            self.send_to_synced(frame, skip, keyframe)
+        return compact
+
+    def publish_palette(self, frame):
+        # Палитра только растёт, поэтому в журнале не копится: хватает последней
+        with self.lock:
+            self.palette = frame
+            self.send_to_synced(frame)
+
+    def send_to_synced(self, frame, skip=None, keyframe=False):
+        # Вызывается под self.lock
+        if self.room.recorder:
+            self.room.recorder.broadcast(self.room.name, frame)
+        relay_frame = pack_keyframe(frame, True) if keyframe else frame
+        for conn in self.room.clients:
+            # Клиенты, потерявшие кадры, получат весь журнал после разгрузки очереди
+            if conn.synced and conn is not skip:
+                conn.send(relay_frame if conn.relay else frame, droppable=True)
+
+    def reset(self, keyframe, keep=0):
+        # Новый опорный кадр; игрокам рассылать его не нужно - у них холст уже такой,
+        # а ретрансляторам - чтобы и их журнал начался заново.
+        # keep последних кадров журнала пришли уже после снимка холста и остаются после него
+        with self.lock:
+            kept = self.frames[len(self.frames) - keep:] if keep else []
+            self.replace(keyframe)
+            self.frames = kept
+            self.log_bytes = sum(frame_size(frame) for frame in kept)
+            relay_frame = pack_keyframe(keyframe, False, len(kept))
+            for conn in self.room.clients:
+                if conn.relay and conn.synced:
+                    conn.send(relay_frame, droppable=True)
+
+    def mark(self):
+        # Место в журнале, на котором снят холст: опорный кадр из снимка можно закодировать
+        # вне блокировки и потом отдать в reset_since
+        with self.lock:
+            return self.generation, len(self.frames)
+
+    def reset_since(self, keyframe, mark):
+        # Кадры журнала после mark остаются. Если с тех пор опорный кадр уже сменился
+        # (очистка, новый раунд), этот устарел и не нужен
+        with self.lock:
+            generation, count = mark
+            if generation == self.generation:
+                self.reset(keyframe, len(self.frames) - count)
+
+    def cancel_compaction(self):
+        # Опорный кадр снять не удалось - закажем при следующем кадре
+        with self.lock:
+            self.compacting = False
+
+    def replace(self, keyframe):
+        # Вызывается под self.lock
+        self.keyframe = keyframe
+        self.frames = []
+        self.log_bytes = 0
+        self.compacting = False
+        self.generation += 1
+
+    def snapshot(self, relay=False):
+        # Ретранслятору опорный кадр - всегда, хотя бы очистка: его холст мог быть
+        # не пустым, если он переподключился
+        with self.lock:
+            keyframe = self.keyframe
+            if relay:
+                keyframe = pack_keyframe(keyframe or pack_frame(STROKE, encode_stroke({"k": "clear"})), True)
+            return [frame for frame in (self.palette, keyframe) if frame] + self.frames
+
+    def join(self, conn):
+        # Новый игрок: весь холст и сразу в рассылку, без пропусков между ними
+        with self.lock:
+            self.resync(conn)
+            self.room.add_client(conn)
+
+    def resync(self, conn):
+        with self.lock:
+            if conn.send_snapshot(self.snapshot(conn.relay)):
+                conn.synced = True
@@ -1,165 +1,202 @@
 import math
+import os
 import sys
-import random
 import socket
-import threading
+import time
 from datetime import datetime
 from contextlib import closing
+
+# python design.py --headless - сервер без окна, Qt для него не нужен (см. headless.py)
+if __name__ == '__main__' and '--headless' in sys.argv[1:]:
+    import headless
+    sys.exit(headless.main([arg for arg in sys.argv[1:] if arg != '--headless']))
+
 from PyQt6.QtWidgets import (QApplication, QWidget, QPushButton, QVBoxLayout,
                              QLabel, QSlider, QHBoxLayout, QMessageBox, QInputDialog, QColorDialog, QTextEdit)
-from PyQt6.QtCore import Qt, QPoint, QTimer, QThread, pyqtSignal, QBuffer, QIODevice, QRect, QSize
-from PyQt6.QtGui import QColor, QPainter, QImage, QPen, QBrush
+from PyQt6.QtCore import Qt, QPoint, QTimer, QThread, pyqtSignal, QRect, QRectF
+from PyQt6.QtGui import QColor, QPainter, QImage, QBrush
+
+# Общие для сервера и клиента модули лежат уровнем выше (Game/Split)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from strokes import paint_stroke, stroke_rect, draw_stroke
+from broadcast import FrameEncoder
+from game_server import GameServer
+from words import random_word
+from live import LiveState, LIVE_FPS, NO_CURSOR
+from protocol import MAX_STROKE_POINTS, pack_text
+from rooms import DEFAULT_ROOM
+from canvas import CANVAS_WIDTH, CANVAS_HEIGHT
+
+# Как рассылать рисунок: "stroke" - векторными штрихами,
+# "raster" - картинками (только изменившиеся куски холста),
+# "tiles" - изменившимися плитками по хешам (см. tiles.py)
+BROADCAST_MODE = os.environ.get("PICTIONARY_BROADCAST", "stroke")
+# Сколько раз в секунду максимум рассылать рисунок (0 - без ограничения)
+MAX_FPS = int(os.environ.get("PICTIONARY_MAX_FPS", "30"))
+# Как обслуживать соединения: "threads" - поток на клиента, "asyncio" - один цикл событий
+SERVER_ENGINE = os.environ.get("PICTIONARY_ENGINE", "threads")
 
 def is_port_in_use(port):
     with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
         return sock.connect_ex(('localhost', port)) == 0
 
-def recvall(sock, n):
-    data = b''
-    while len(data) < n:
-        packet = sock.recv(n - len(data))
-        if not packet:
-            return None
-        data += packet
-    return data
-
-class ServerThread(QThread):
+class ServerThread(QThread, GameServer):
+    # Игровой сервер (game_server.py) в отдельном потоке Qt, плюс холст ведущего
     message_received = pyqtSignal(str)
     top_players_updated = pyqtSignal(str)
+    keyframe_requested = pyqtSignal()  # Журналу рисунка нужен новый опорный кадр
 
     def __init__(self):
-        super().__init__()
-        self.server_socket = None
-        self.running = False
-        self.clients = []
-        self.draw_area = None  # Будет установлено позже
-        self.secret_word = None
-        self.player_scores = {}
+        super().__init__()  # Вызывает и GameServer.__init__
+        self.engine = SERVER_ENGINE
+        self.broadcast_mode = BROADCAST_MODE
+        # Планировщик рассылки: изменения копятся и уходят не чаще max_fps раз в секунду
+        self.max_fps = MAX_FPS
+        self.frame_pending = False
+        self.pending_strokes = []
+        self.last_frame_time = 0.0
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self.flush_frame)
+        # Курсор и фигура-заготовка ведущего (live.py): тоже не чаще LIVE_FPS, уходит последнее состояние
+        self.live_state = None
+        self.last_live_time = 0.0
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.timeout.connect(self.flush_live)
+        self.broadcaster = FrameEncoder(self.room, on_compact=self.keyframe_requested.emit)
+        self.broadcaster.start()
+        # Снимок холста можно взять только в GUI-потоке
+        self.keyframe_requested.connect(self.send_keyframe)
+
+    # Окно ведущего работает с игрой своей комнаты
+    @property
+    def clients(self):
+        return self.room.clients
+
+    @property
+    def draw_area(self):
+        return self.room.draw_area
+
+    @draw_area.setter
+    def draw_area(self, draw_area):
+        self.room.draw_area = draw_area
+
+    @property
+    def secret_word(self):
+        return self.room.secret_word
+
+    @secret_word.setter
+    def secret_word(self, word):
+        self.room.secret_word = word
 
     def run(self):
         self.running = True
         try:
-            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             port = 12345
             while is_port_in_use(port):
                 port += 1
-            self.server_socket.bind(('192.168.30.88', port))
-            self.server_socket.listen(5)
-            self.message_received.emit(f"Ожидается подключение на порту {port}...")
-
-            while self.running:
-                client_socket, addr = self.server_socket.accept()
-                # При подключении ожидаем, что клиент отправит свой ник в виде обычного текста
-                nickname = client_socket.recv(1024).decode().replace("Ник: ", "")
-                self.message_received.emit(f"Подключился игрок: {nickname} ({addr[0]})")
-                self.clients.append((client_socket, nickname))
-                client_thread = threading.Thread(target=self.handle_client, args=(client_socket, nickname))
-                client_thread.start()
+            server_socket.bind(('192.168.30.88', port))
+            engine = " (asyncio)" if self.engine == "asyncio" else ""
+            self.message_received.emit(f"Ожидается подключение на порту {port}{engine}...")
+            self.serve(server_socket)
         except Exception as e:
             self.message_received.emit(f"Ошибка: {e}")
 
-    def update_top_players(self):
-        # Сортируем игроков по количеству очков (в порядке убывания)
-        sorted_players = sorted(self.player_scores.items(), key=lambda x: x[1], reverse=True)
-        top_players_message = "Топ игроков:\n"
-        for i, (player, score) in enumerate(sorted_players, start=1):
-            top_players_message += f"{i}. {player}: {score} очков\n"
-
-        # Отправляем сообщение с топом игроков на сервер
-        self.message_received.emit(top_players_message)
+    def show_message(self, message):
+        self.message_received.emit(message)
 
-        return top_players_message
+    def register_client(self, conn, addr, room_name="", compression=(), live="", relay=False):
+        # Слово загадывает и рисует ведущий, а он играет только в своей комнате: в других
+        # раунда не было бы никогда. Поэтому все игроки окна ведущего - в его комнате
+        asked = room_name.strip()
+        super().register_client(conn, addr, DEFAULT_ROOM, compression, live, relay)
+        if asked and asked != DEFAULT_ROOM:
+            conn.send(pack_text(f"Комнаты {asked} здесь нет: у этого сервера одна комната, {DEFAULT_ROOM}"))
 
-    def handle_client(self, client_socket, nickname):
-        try:
-            # Отправляем приветственное сообщение с типом T
-            welcome = "Добро пожаловать на сервер!"
-            data = b'T' + len(welcome.encode()).to_bytes(4, 'big') + welcome.encode()
-            client_socket.sendall(data)
-            while self.running:
-                type_byte = client_socket.recv(1)
-                if not type_byte:
-                    break
-                length_bytes = recvall(client_socket, 4)
-                if not length_bytes:
-                    break
-                msg_length = int.from_bytes(length_bytes, 'big')
-                payload = recvall(client_socket, msg_length)
-                if payload is None:
-                    break
-                if type_byte == b'T':
-                    text = payload.decode().strip()
-                    full_message = f"{nickname}: {text}"
-                    self.message_received.emit(full_message)
-
-                    # Проверяем, угадано ли слово
-                    if self.secret_word and text.lower() == self.secret_word.lower():
-                        result_message = f"Загаданное слово: {self.secret_word}!"
-                        self.message_received.emit(result_message)
-
-                        # Начисляем 100 очков игроку, который отгадал слово
-                        if nickname not in self.player_scores:
-                            self.player_scores[nickname] = 0
-                        self.player_scores[nickname] += 100
-
-                        # Обновляем топ игроков
-                        top_players_message = self.update_top_players()
-                        self.top_players_updated.emit(top_players_message)
-
-
-                        # Отправляем сообщение всем клиентам
-                        for client, _ in self.clients:
-                            try:
-                                client.sendall(
-                                    b'T' + len(result_message.encode()).to_bytes(4, 'big') + result_message.encode())
-                                client.sendall(
-                                    b'T' + len(top_players_message.encode()).to_bytes(4,
-                                                                                      'big') + top_players_message.encode())
-                            except Exception as e:
-                                print(f"Ошибка отправки сообщения клиенту: {e}")
-
-                        # Обновляем топ игроков на сервере
-                        if self.draw_area and hasattr(self.draw_area.parent(), 'update_top_players_display'):
-                            self.draw_area.parent().update_top_players_display()
-
-                        # Сбрасываем загаданное слово и переходим в состояние ожидания нового слова
-                        self.secret_word = None
-                        self.message_received.emit("Ожидание нового слова...")
-
-                    # Рассылаем текстовое сообщение всем клиентам
-                    for client, _ in self.clients:
-                        try:
-                            client.sendall(b'T' + len(full_message.encode()).to_bytes(4, 'big') + full_message.encode())
-                        except Exception as e:
-                            print(f"Ошибка отправки сообщения клиенту: {e}")
-        except Exception as e:
-            self.message_received.emit(f"Ошибка: {e}")
-        finally:
-            # Закрываем сокет только при завершении потока
-            client_socket.close()
-            self.clients = [(client, nick) for client, nick in self.clients if client != client_socket]
+    def round_won(self, room, top_players_message):
+        if room is not self.room:
+            return
+        # Окно обновит топ по сигналу в своём потоке
+        self.top_players_updated.emit(top_players_message)
 
     def broadcast_image(self):
         if not self.draw_area:
             return
-        image_bytes = self.draw_area.get_image_bytes()
-        data = b'I' + len(image_bytes).to_bytes(4, 'big') + image_bytes
-        for client, _ in self.clients:
-            try:
-                client.sendall(data)
-            except Exception as e:
-                print(f"Ошибка отправки изображения: {e}")
+        # Кодирование и отправка идут в отдельных потоках, здесь только снимок холста
+        self.broadcaster.submit_image(QImage(self.draw_area.image), self.draw_area.take_dirty_rect(),
+                                      tiles=self.broadcast_mode == "tiles")
+
+    def send_keyframe(self):
+        # Сначала отправляем накопленные штрихи: снимок должен включать ровно то, что уже в журнале
+        if self.draw_area:
+            self.flush_frame()
+            self.broadcaster.submit_keyframe(QImage(self.draw_area.image), tiles=self.broadcast_mode == "tiles")
+
+    def broadcast_stroke(self, stroke):
+        # Вместо всего холста отправляем только сам штрих - клиенты рисуют его у себя
+        self.broadcaster.submit_stroke(stroke)
+
+    def schedule_frame(self, stroke):
+        # Вызывается на каждое изменение холста, сама рассылка - в flush_frame
+        if "c" in stroke:
+            self.broadcaster.note_color(stroke["c"])
+        if self.broadcast_mode in ("raster", "tiles"):
+            self.frame_pending = True  # Картинка нужна только самая свежая
+        else:
+            self.queue_stroke(stroke)
+        if self.frame_timer.isActive():
+            return
+        delay = 0 if self.max_fps <= 0 else self.last_frame_time + 1 / self.max_fps - time.monotonic()
+        if delay <= 0:
+            self.flush_frame()
+        else:
+            self.frame_timer.start(math.ceil(delay * 1000))
+
+    def queue_stroke(self, stroke):
+        # Продолжение той же линии склеиваем с предыдущим отрезком в одну ломаную
+        if self.pending_strokes and stroke["k"] in ("pen", "eraser"):
+            last = self.pending_strokes[-1]
+            if (last["k"] == stroke["k"] and last.get("c") == stroke.get("c") and last["w"] == stroke["w"]
+                    and last["p"][-2:] == stroke["p"][:2] and len(last["p"]) < 2 * MAX_STROKE_POINTS):
+                last["p"] = last["p"] + stroke["p"][2:]
+                return
+        self.pending_strokes.append(dict(stroke))
+
+    def flush_frame(self):
+        # Отправляем всё накопленное; вызывается по таймеру и в конце штриха
+        self.frame_timer.stop()
+        self.last_frame_time = time.monotonic()
+        strokes, self.pending_strokes = self.pending_strokes, []
+        for stroke in strokes:
+            self.broadcast_stroke(stroke)
+        if self.frame_pending:
+            self.frame_pending = False
+            self.broadcast_image()
+
+    def publish_live(self, state):
+        # Вызывается на каждое движение мыши; промежуточные положения не нужны
+        self.live_state = state
+        if self.live_timer.isActive():
+            return
+        delay = 0 if LIVE_FPS <= 0 else self.last_live_time + 1 / LIVE_FPS - time.monotonic()
+        if delay <= 0:
+            self.flush_live()
+        else:
+            self.live_timer.start(math.ceil(delay * 1000))
+
+    def flush_live(self):
+        self.last_live_time = time.monotonic()
+        state, self.live_state = self.live_state, None
+        if state is not None and self.live:
+            self.live.publish(self.room, state)
 
     def stop(self):
-        self.running = False
-        for client, _ in self.clients:
-            try:
-                client.close()
-            except Exception as e:
-                print(f"Ошибка при закрытии сокета: {e}")
-        if self.server_socket:
-            self.server_socket.close()
-            self.server_socket = None
+        self.frame_timer.stop()
+        self.live_timer.stop()
+        self.broadcaster.stop()
+        super().stop()
 
 class DrawArea(QLabel):
     def __init__(self, parent=None):
@@ -169,92 +206,153 @@ class DrawArea(QLabel):
         self.drawing_shape = False
         self.shape_type = None  # "circle", "square", "triangle"
         self.start_point = QPoint()
-        self.image = QImage(self.size(), QImage.Format.Format_ARGB32)
+        self.preview = None  # Фигура, которую тянут, но ещё не отпустили (штрих без отправки)
+        # Курсор нужен зрителям и без нажатой кнопки (живой канал, live.py)
+        self.setMouseTracking(True)
+        # Холст всегда в логическом разрешении (canvas.py), окно его только растягивает
+        self.image = QImage(CANVAS_WIDTH, CANVAS_HEIGHT, QImage.Format.Format_ARGB32)
         self.image.fill(Qt.GlobalColor.white)
+        self.dirty_rect = QRect()  # Что изменилось с последней отправки картинки
         self.pen_size = 5
         self.current_color = QColor(Qt.GlobalColor.black)
         self.eraser_mode = False
         self.setEnabled(False)
 
     def clear_canvas(self):
-        self.image.fill(Qt.GlobalColor.white)
+        self.apply_stroke({"k": "clear"})
+
+    def apply_stroke(self, stroke):
+        # Рисуем штрих у себя и рассылаем его клиентам
+        paint_stroke(self.image, stroke)
+        self.dirty_rect = self.dirty_rect.united(stroke_rect(stroke, self.image))
         self.update()
+        if self.parent() and hasattr(self.parent(), 'server_thread'):
+            self.parent().server_thread.schedule_frame(stroke)
+
+    def flush_broadcast(self):
+        # Штрих закончен - клиенты должны сразу получить итоговую картинку
+        if self.parent() and hasattr(self.parent(), 'server_thread'):
+            self.parent().server_thread.flush_frame()
+
+    def publish_live(self, point=None):
+        # Курсор и заготовка фигуры - зрителям по живому каналу; point None - курсор ушёл с холста
+        if not (self.parent() and hasattr(self.parent(), 'server_thread')):
+            return
+        x, y = (point.x(), point.y()) if point is not None else (NO_CURSOR, NO_CURSOR)
+        color = QColor(Qt.GlobalColor.white) if self.eraser_mode else self.current_color
+        self.parent().server_thread.publish_live(LiveState(x, y, min(self.pen_size, 255), color.name(), self.preview))
+
+    def to_canvas(self, event):
+        # Точка окна -> точка холста
+        position = event.position()
+        return QPoint(int(position.x() * self.image.width() / max(self.width(), 1)),
+                      int(position.y() * self.image.height() / max(self.height(), 1)))
+
+    def image_to_widget(self, rect):
+        # Холст растягивается на весь виджет; переводим область холста в координаты виджета
+        sx = self.width() / max(self.image.width(), 1)
+        sy = self.height() / max(self.image.height(), 1)
+        return QRectF(rect.x() * sx, rect.y() * sy, rect.width() * sx, rect.height() * sy).toAlignedRect()
+
+    def take_dirty_rect(self):
+        rect = self.dirty_rect
+        self.dirty_rect = QRect()
+        return rect
 
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton and self.isEnabled():
             if self.shape_type:
                 self.drawing_shape = True
-                self.start_point = event.position().toPoint()
+                self.start_point = self.to_canvas(event)
             else:
                 self.drawing = True
-                self.last_point = event.position().toPoint()
+                self.last_point = self.to_canvas(event)
 
     def mouseMoveEvent(self, event):
-        if self.drawing and self.isEnabled() and not self.drawing_shape:
-            painter = QPainter(self.image)
-            pen = QPen(self.current_color, self.pen_size) if not self.eraser_mode else QPen(Qt.GlobalColor.white, self.pen_size)
-            painter.setPen(pen)
-            current_point = event.position().toPoint()
-            painter.drawLine(self.last_point, current_point)
+        if not self.isEnabled():
+            return
+        if self.drawing_shape:
+            # Заготовку видно и ведущему, и зрителям, на холст она попадёт, когда кнопку отпустят
+            old_preview = self.preview
+            self.preview = self.shape_stroke(self.to_canvas(event))
+            self.update_preview(old_preview)
+        self.publish_live(self.to_canvas(event))
+        if self.drawing and not self.drawing_shape:
+            current_point = self.to_canvas(event)
+            if self.eraser_mode:
+                stroke = {"k": "eraser", "w": self.pen_size}
+            else:
+                stroke = {"k": "pen", "c": self.current_color.name(), "w": self.pen_size}
+            stroke["p"] = [self.last_point.x(), self.last_point.y(), current_point.x(), current_point.y()]
             self.last_point = current_point
-            self.update()
-            # Отправляем обновлённое изображение всем клиентам
-            if self.parent() and hasattr(self.parent(), 'server_thread'):
-                self.parent().server_thread.broadcast_image()
+            # Отправляем клиентам только новый отрезок
+            self.apply_stroke(stroke)
 
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton and self.isEnabled():
             if self.drawing_shape:
-                painter = QPainter(self.image)
-                painter.setPen(QPen(self.current_color, self.pen_size))  # Убираем заливку
-
-                end_point = event.position().toPoint()
-                rect = QRect(self.start_point, end_point)
-
-                if self.shape_type == "circle":
-                    painter.drawEllipse(rect)
-                elif self.shape_type == "square":
-                    side = min(abs(rect.width()), abs(rect.height()))
-                    square_rect = QRect(self.start_point, QSize(side, side))
-                    painter.drawRect(square_rect)
-                elif self.shape_type == "right_triangle":
-                    # Длина катетов (равных)
-                    base_length = abs(end_point.x() - self.start_point.x())  # Длина по оси X
-                    height_length = abs(end_point.y() - self.start_point.y())  # Длина по оси Y
-
-                    # Делаем катеты равными
-                    side_length = min(base_length, height_length)
-
-                    # Точки для равнобедренного прямоугольного треугольника
-                    p1 = self.start_point  # Левый нижний угол
-                    p2 = QPoint(self.start_point.x() + side_length, self.start_point.y())  # Нижний правый угол
-                    p3 = QPoint(self.start_point.x() + side_length // 2,
-                                self.start_point.y() - side_length)  # Верхний угол
-
-                    # Рисуем треугольник
-                    painter.drawPolygon(p1, p2, p3)
-
+                stroke = self.shape_stroke(self.to_canvas(event))
+                old_preview, self.preview = self.preview, None
+                self.update_preview(old_preview)
+                # Рисуем фигуру и отправляем её клиентам
+                self.apply_stroke(stroke)
                 self.drawing_shape = False
                 self.shape_type = None
-                self.update()
             else:
                 self.drawing = False
+            self.flush_broadcast()
+            self.publish_live(self.to_canvas(event))
+
+    def leaveEvent(self, event):
+        if self.isEnabled():
+            self.publish_live()
+        super().leaveEvent(event)
+
+    def shape_stroke(self, end_point):
+        # Фигура от точки нажатия до end_point
+        stroke = {"k": self.shape_type, "c": self.current_color.name(), "w": self.pen_size}  # Без заливки
+        rect = QRect(self.start_point, end_point)
+
+        if self.shape_type == "circle":
+            stroke["r"] = [rect.x(), rect.y(), rect.width(), rect.height()]
+        elif self.shape_type == "square":
+            side = min(abs(rect.width()), abs(rect.height()))
+            stroke["r"] = [self.start_point.x(), self.start_point.y(), side, side]
+        elif self.shape_type == "right_triangle":
+            # Длина катетов (равных)
+            base_length = abs(end_point.x() - self.start_point.x())  # Длина по оси X
+            height_length = abs(end_point.y() - self.start_point.y())  # Длина по оси Y
+
+            # Делаем катеты равными
+            side_length = min(base_length, height_length)
+
+            # Точки для равнобедренного прямоугольного треугольника
+            p1 = self.start_point  # Левый нижний угол
+            p2 = QPoint(self.start_point.x() + side_length, self.start_point.y())  # Нижний правый угол
+            p3 = QPoint(self.start_point.x() + side_length // 2,
+                        self.start_point.y() - side_length)  # Верхний угол
+
+            stroke["p"] = [p1.x(), p1.y(), p2.x(), p2.y(), p3.x(), p3.y()]
+        return stroke
+
+    def update_preview(self, old_preview):
+        # Перерисовываем только там, где заготовка была и где она теперь
+        for stroke in (old_preview, self.preview):
+            if stroke is not None:
+                self.update(self.image_to_widget(stroke_rect(stroke, self.image)).adjusted(-1, -1, 1, 1))
 
     def paintEvent(self, event):
         super().paintEvent(event)
         painter = QPainter(self)
         painter.drawImage(self.rect(), self.image, self.image.rect())
+        if self.preview is not None:
+            painter.save()
+            painter.scale(self.width() / max(self.image.width(), 1), self.height() / max(self.image.height(), 1))
+            draw_stroke(painter, self.preview)
+            painter.restore()
         painter.setBrush(QBrush(self.current_color))
         painter.drawEllipse(10, 10, 30, 30)
 
-    def resizeEvent(self, event):
-        new_image = QImage(self.size(), QImage.Format.Format_ARGB32)
-        new_image.fill(Qt.GlobalColor.white)
-        painter = QPainter(new_image)
-        painter.drawImage(QPoint(0, 0), self.image)
-        self.image = new_image
-        super().resizeEvent(event)
-
     def set_pen_size(self, size):
         self.pen_size = size
 
@@ -265,12 +363,6 @@ class DrawArea(QLabel):
     def set_eraser_mode(self, enabled):
         self.eraser_mode = enabled
 
-    def get_image_bytes(self):
-        buffer = QBuffer()
-        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
-        self.image.save(buffer, "PNG")
-        return bytes(buffer.data())
-
     def set_shape(self, shape):
         self.shape_type = shape
 
@@ -397,9 +489,8 @@ class StartWindow(QWidget):
     def get_timestamp(self):
         return f"[{datetime.now().strftime('%H:%M:%S')}] "
 
-    def update_top_players_display(self):
-        # Получаем текущий топ игроков из серверного потока
-        top_players_message = self.server_thread.update_top_players()
+    def update_top_players_display(self, top_players_message):
+        # Топ уже посчитан сервером при начислении очков
         # Обновляем поле с топом игроков на сервере
         self.squareTop.setText(top_players_message)
 
@@ -435,10 +526,9 @@ class StartWindow(QWidget):
         self.squareDraw.set_pen_size(value)
 
     def generate_random_word(self):
-        words = ["Яблоко", "Солнце", "Море", "Гора", "Книга", "Компьютер", "Собака", "Кошка", "Дом", "Машина"]
-        random_word = random.choice(words)
-        self.squareWord.setText(random_word)
-        self.server_thread.secret_word = random_word
+        word = random_word()
+        self.squareWord.setText(word.text)
+        self.server_thread.secret_word = word
 
     def set_custom_word(self):
         custom_word, ok = QInputDialog.getText(self, "Загадать слово", "Введите слово:")
@@ -0,0 +1,345 @@
+# Логика игрового сервера без Qt: комнаты, подключения, чат, отгадывание слов и очки.
+# Окно ведущего (ServerThread в design.py) наследует её и добавляет холст и сигналы Qt,
+# рабочие процессы (shard.py) используют как есть.
+import asyncio
+import socket
+import sqlite3
+import threading
+
+from framing import FrameReader, pack_frame
+from protocol import TEXT, IMAGE, STROKE, TILES, pack_text, parse_handshake, make_handshake, decode_stroke, encode_stroke, pack_capabilities, \
+    pack_canvas_size
+from compression import negotiate
+import metrics
+from outbox import ClientConnection
+from rooms import RoomRegistry, DEFAULT_ROOM
+from leaderboard import ScoreStore, SCORES_DB, format_places
+from guess import match, reveals, CORRECT, CLOSE
+from recording import Recorder, RECORD_FILE
+from tiles import pack_tiles, unpack_tile_request, NO_POSITION
+from live import LIVE_CHANNEL
+from live_channel import LiveChannel
+from canvas import CANVAS_WIDTH, CANVAS_HEIGHT, encode_rgb_png
+import aio_server
+
+# Сколько самых нагруженных игроков показывать в метриках
+TOP_CLIENTS = 10
+# Сколько плиток холста игрок может попросить одним кадром (весь холст - 176 плиток)
+MAX_TILE_REQUEST = 256
+
+
+class GameServer:
+    def __init__(self, engine="threads", record=RECORD_FILE):
+        self.server_socket = None
+        self.running = False
+        self.engine = engine  # "threads" - поток на клиента, "asyncio" - один цикл событий
+        self.aio_loop = None
+        self.aio_stopped = None
+        self.live = None  # Живой канал по UDP (live.py), открывается в serve()
+        self.scores = None  # Очки на диске; без файла очки живут, пока работает сервер
+        if SCORES_DB:
+            try:
+                self.scores = ScoreStore(SCORES_DB)
+            except sqlite3.Error as e:
+                print(f"Очки не будут сохраняться: {e}")
+        # Комнаты с отдельными играми; ведущий играет в комнате DEFAULT_ROOM
+        # Запись игры в файл (recording.py); пустой путь - не пишем
+        self.recorder = Recorder(record) if record else None
+        self.rooms = RoomRegistry(self.scores, self.recorder)
+        self.room = self.rooms.get_or_create(DEFAULT_ROOM)
+        metrics.add_collector(self.collect_metrics)
+
+    def serve(self, server_socket):
+        # server_socket уже привязан к адресу; возвращается после stop()
+        self.running = True
+        self.server_socket = server_socket
+        metrics.start()
+        if LIVE_CHANNEL:
+            try:
+                self.live = LiveChannel(server_socket.getsockname())
+            except OSError as e:
+                print(f"Живой канал не открыт: {e}")
+        if self.engine == "asyncio":
+            # Цикл событий держит сколько угодно соединений, очередь на подключение тоже большая
+            server_socket.listen(socket.SOMAXCONN)
+            asyncio.run(aio_server.serve(self, server_socket))
+            return
+        server_socket.listen(5)
+        while self.running:
+            client_socket, addr = server_socket.accept()
+            # При подключении ожидаем, что клиент отправит свой ник (и комнату) в виде обычного текста
+            nickname, room_name, compression, live, relay = parse_handshake(client_socket.recv(1024))
+            self.accept_client(client_socket, addr, nickname, room_name, compression, live, relay)
+
+    def accept_client(self, client_socket, addr, nickname, room_name, compression=(), live="", relay=False):
+        conn = ClientConnection(client_socket, nickname, on_event=self.client_event)
+        self.register_client(conn, addr, room_name, compression, live, relay)
+        client_thread = threading.Thread(target=self.handle_client, args=(conn,))
+        client_thread.start()
+
+    def register_client(self, conn, addr, room_name="", compression=(), live="", relay=False):
+        # Сначала отвечаем на рукопожатие: какие способы сжатия приняты (только если клиент их предлагал)
+        if compression:
+            accepted = negotiate(compression)
+            conn.send(pack_capabilities(accepted))
+            conn.codec.enable(accepted)
+        # и куда слать HELLO живого канала, если клиент его просил и канал открыт
+        if live == "udp" and self.live:
+            conn.send(self.live.register(conn))
+        room = self.rooms.get_or_create(room_name)
+        conn.room = room
+        conn.relay = relay
+        # Размер холста: штрихи - в логических координатах, картинки - в разрешении комнаты
+        conn.send(pack_canvas_size((CANVAS_WIDTH, CANVAS_HEIGHT), room.network_size))
+        if self.recorder:
+            self.recorder.handshake(conn, room.name, make_handshake(conn.nickname, room.name, compression, live, relay))
+        # Отправляем приветственное сообщение с типом T
+        conn.send(pack_text(f"Добро пожаловать на сервер! Комната: {room.name}"))
+        # Дальше игрок получает только изменившиеся места, поэтому сначала - весь топ
+        with room.lock:
+            top = room.leaderboard.top()
+            if top:
+                conn.send(pack_text(format_places("Топ игроков:", top)))
+        # Сразу присылаем уже нарисованное и включаем игрока в рассылку
+        room.canvas_log.join(conn)
+        self.log(room, f"Подключился {'ретранслятор' if relay else 'игрок'}: {conn.nickname} ({addr[0]})")
+
+    def remove_client(self, conn):
+        conn.close()
+        if self.live:
+            self.live.forget(conn)
+        if self.recorder:
+            self.recorder.disconnect(conn)
+        if conn.room:
+            conn.room.remove_client(conn)
+            if self.rooms.remove_if_empty(conn.room):
+                self.room_closed(conn.room)
+
+    def room_closed(self, room):
+        # Из комнаты вышли все, и она удалена; рабочий процесс сообщает об этом главному (shard.py)
+        pass
+
+    def log(self, room, message):
+        # События чужих комнат помечаем названием комнаты
+        if room is not self.room:
+            message = f"[{room.name}] {message}"
+        self.show_message(message)
+
+    def show_message(self, message):
+        print(message)
+
+    def update_top_players(self, room=None):
+        room = room or self.room
+        # Таблица мест уже отсортирована, берём первые места
+        with room.lock:
+            top_players_message = format_places("Топ игроков:", room.leaderboard.top())
+
+        # Отправляем сообщение с топом игроков на сервер
+        self.log(room, top_players_message)
+
+        return top_players_message
+
+    def broadcast_text(self, message, room=None):
+        # Сообщение получают только игроки комнаты
+        room = room or self.room
+        data = pack_text(message)
+        if self.recorder:
+            self.recorder.broadcast(room.name, data)
+        for conn in room.clients:
+            conn.send(data)
+
+    def client_event(self, conn, event):
+        # Вызывается из потока очереди клиента, который не успевал получать данные
+        if event == "drain":
+            # Очередь разгребли после потери кадров - присылаем холст из журнала комнаты
+            conn.room.canvas_log.resync(conn)
+        elif event == "disconnect":
+            self.log(conn.room, f"Игрок {conn.nickname} отключён: не успевает получать данные")
+
+    def handle_client(self, conn):
+        reader = FrameReader(conn.sock)
+        try:
+            while self.running:
+                frame = reader.read_frame()
+                if frame is None:
+                    break
+                type_byte, payload = conn.codec.decode(*frame)
+                metrics.FRAMES_RECEIVED.inc(chr(type_byte[0]))
+                if self.recorder:
+                    self.recorder.client_frame(conn, type_byte, payload)
+                if type_byte == TEXT:
+                    self.handle_text(conn, str(payload, 'utf-8').strip())
+                elif type_byte == STROKE:
+                    self.handle_stroke(conn, payload)
+                elif type_byte == TILES:
+                    self.handle_tile_request(conn, payload)
+        except Exception as e:
+            self.log(conn.room, f"Ошибка: {e}")
+        finally:
+            # Закрываем сокет только при завершении потока
+            self.remove_client(conn)
+
+    def handle_text(self, conn, text):
+        # Сообщение чата от игрока; общее для обоих движков (потоки и asyncio)
+        if conn.relay:
+            return  # Ретранслятор только смотрит
+        nickname = conn.nickname
+        room = conn.room
+        full_message = f"{nickname}: {text}"
+        self.log(room, full_message)
+
+        # Проверяем, угадано ли слово. Сравниваем без блокировки, со снимком слова раунда;
+        # регистр, ё/е, пробелы и знаки препинания не важны.
+        # Тот, кто рисует, своё слово не отгадывает
+        secret_key = room.secret_key
+        if secret_key and conn is room.drawer and reveals(text, secret_key):
+            # Рисующий не может подсказать слово в чате: сообщение не рассылаем
+            conn.send(pack_text("Нельзя писать загаданное слово в чат."))
+            return
+        verdict = match(text, secret_key) if secret_key and conn is not room.drawer else None
+        with room.lock:
+            # Пока сравнивали, слово могли отгадать
+            guessed = verdict == CORRECT and room.secret_key == secret_key
+            if guessed:
+                word = room.secret_word
+                # Сбрасываем загаданное слово и переходим в состояние ожидания нового слова
+                room.secret_word = None
+                self.word_guessed(room)
+                # Начисляем 100 очков игроку, который отгадал слово
+                old_place, new_place = room.leaderboard.add(nickname, 100)
+                score = room.leaderboard.scores[nickname]
+                changed = room.leaderboard.changed(old_place, new_place)
+                # Отправляем сообщение всем клиентам комнаты; из топа - только сдвинувшиеся места.
+                # Под блокировкой: новый игрок получит весь топ либо до этих изменений, либо после
+                result_message = f"Загаданное слово: {word}!"
+                self.broadcast_text(result_message, room)
+                if changed:
+                    self.broadcast_text(format_places("Топ игроков (изменения):", changed), room)
+        if verdict:
+            metrics.GUESSES.inc(room.name, verdict)
+        if verdict == CLOSE:
+            # Почти угадал: подсказка только ему, остальным догадку не показываем
+            conn.send(pack_text("Почти! Вы очень близки к ответу."))
+            return
+        if guessed:
+            if self.scores:
+                self.scores.save(room.name, nickname, score)
+            self.log(room, result_message)
+
+            # Обновляем топ игроков
+            top_players_message = self.update_top_players(room)
+            self.round_won(room, top_players_message)
+
+            self.log(room, "Ожидание нового слова...")
+
+        # Рассылаем текстовое сообщение всем клиентам комнаты
+        self.broadcast_text(full_message, room)
+
+    def handle_stroke(self, conn, payload):
+        # Штрих от игрока: рисовать может только тот, кому сервер отдал холст в этом раунде
+        room = conn.room
+        if conn is not room.drawer or room.secret_word is None:
+            return
+        # Дальше идёт проверенный штрих: координаты в пределах холста, толщина не больше допустимой
+        stroke = decode_stroke(payload)
+        frame = pack_frame(STROKE, encode_stroke(stroke))
+        with room.canvas_log.lock:
+            if room.canvas is not None:
+                room.canvas.apply(stroke)
+            compact = room.canvas_log.publish(frame, keyframe=stroke["k"] == "clear", skip=conn)
+        if compact:
+            self.compact_canvas(room)
+
+    def handle_tile_request(self, conn, payload):
+        # Игрок просит картинки плиток, которых нет в его кэше (tiles.py)
+        entries = []
+        for digest in unpack_tile_request(payload)[:MAX_TILE_REQUEST]:
+            data = conn.room.tiles.get(digest)
+            if data is not None:
+                entries.append((NO_POSITION, NO_POSITION, digest, data))
+        if entries:
+            conn.send(pack_tiles(entries))
+
+    def compact_canvas(self, room):
+        # Журнал разросся - снимаем весь холст как новый опорный кадр.
+        # Под блокировкой только копия пикселей; PNG на чистом Python кодируется долго, и на asyncio
+        # он не должен стоять в цикле событий, поэтому - в пуле потоков (в движке на потоках
+        # и так в потоке игрока). Кадры, пришедшие за это время, остаются в журнале после него
+        log = room.canvas_log
+        with log.lock:
+            if room.canvas is None:
+                log.cancel_compaction()
+                return
+            snapshot = room.canvas.snapshot()
+            mark = log.mark()
+        if self.aio_loop:
+            self.aio_loop.run_in_executor(None, self.finish_compaction, room, snapshot, mark)
+        else:
+            self.finish_compaction(room, snapshot, mark)
+
+    def finish_compaction(self, room, snapshot, mark):
+        try:
+            with metrics.ENCODE_SECONDS.time("canvas"):
+                image_bytes = encode_rgb_png(*snapshot)
+            room.canvas_log.reset_since(pack_frame(IMAGE, image_bytes), mark)
+        except Exception as e:
+            room.canvas_log.cancel_compaction()
+            self.log(room, f"Ошибка: {e}")
+
+    def word_guessed(self, room):
+        # Вызывается под room.lock сразу после отгадки: раунд закончен в той же критической
+        # секции, и таймер раунда (headless.py) не успеет объявить, что время вышло
+        pass
+
+    def round_won(self, room, top_players_message):
+        # Слово отгадано; окно ведущего обновляет здесь свой топ игроков
+        pass
+
+    def collect_metrics(self):
+        # То, что дешевле посчитать при чтении метрик, чем обновлять на каждом кадре
+        rooms = self.rooms.all_rooms()
+        lines = metrics.gauge("pictionary_clients", "Игроков в комнате",
+                              [((room.name,), len(room.clients)) for room in rooms], ("room",))
+        lines += metrics.gauge("pictionary_queue_bytes", "Байт в очередях отправки игроков комнаты",
+                               [((room.name,), sum(conn.queued_bytes for conn in room.clients)) for room in rooms],
+                               ("room",))
+        lines += metrics.gauge("pictionary_queue_frames_max", "Самая длинная очередь отправки в комнате, кадров",
+                               [((room.name,), max((len(conn.frames) for conn in room.clients), default=0))
+                                for room in rooms], ("room",))
+        lines += metrics.gauge("pictionary_canvas_log_bytes", "Размер журнала рисунка комнаты",
+                               [((room.name,), room.canvas_log.log_bytes) for room in rooms], ("room",))
+        top = sorted(self.rooms.all_clients(), key=lambda conn: conn.bytes_sent, reverse=True)[:TOP_CLIENTS]
+        labels = ("room", "nickname")
+        lines += metrics.gauge("pictionary_client_bytes_sent", "Самые нагруженные игроки: байт отправлено",
+                               [((conn.room.name, conn.nickname), conn.bytes_sent) for conn in top], labels)
+        lines += metrics.gauge("pictionary_client_send_seconds", "Самые нагруженные игроки: время отправки",
+                               [((conn.room.name, conn.nickname), round(conn.send_seconds, 6)) for conn in top], labels)
+        lines += metrics.gauge("pictionary_client_queue_bytes", "Самые нагруженные игроки: байт в очереди",
+                               [((conn.room.name, conn.nickname), conn.queued_bytes) for conn in top], labels)
+        return lines
+
+    def stop(self):
+        metrics.remove_collector(self.collect_metrics)
+        self.running = False
+        if self.scores:
+            self.scores.close()
+        if self.recorder:
+            self.recorder.close()
+        if self.live:
+            self.live.close()
+            self.live = None
+        for conn in self.rooms.all_clients():
+            try:
+                conn.close()
+            except Exception as e:
+                print(f"Ошибка при закрытии сокета: {e}")
+        if self.aio_loop:
+            # Слушающий сокет закроет сам asyncio при остановке цикла
+            try:
+                self.aio_loop.call_soon_threadsafe(self.aio_stopped.set)
+            except RuntimeError:
+                pass  # Цикл событий уже завершился
+            self.aio_loop = None
+        elif self.server_socket:
+            self.server_socket.close()
+        self.server_socket = None
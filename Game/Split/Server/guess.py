@@ -0,0 +1,56 @@
+# Проверка догадок. Загаданное слово нормализуется один раз на раунд (Room.secret_key),
+# догадка - один раз при получении (words.normalize), дальше сравниваются готовые строки.
+# Догадка, которая отличается от слова на одну-две буквы, - "почти": игрок получает подсказку
+# только для себя, а остальным её не показываем, чтобы не выдать слово.
+from words import normalize
+
+CORRECT = "correct"
+CLOSE = "close"
+WRONG = "wrong"
+
+
+def near_miss_limit(secret_key):
+    # Сколько опечаток прощать: в коротких словах одна буква - это уже другое слово
+    if len(secret_key) <= 3:
+        return 0
+    return 1 if len(secret_key) <= 7 else 2
+
+
+def edit_distance(a, b, limit):
+    # Расстояние Левенштейна, если оно не больше limit, иначе None.
+    # Считаем только полосу шириной 2*limit+1 вокруг диагонали и выходим,
+    # как только вся строка таблицы вышла за limit: длинная чепуха отсекается за пару строк
+    if abs(len(a) - len(b)) > limit:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i, char in enumerate(a, start=1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        for j in range(low, high + 1):
+            cost = min(previous[j - 1] + (char != b[j - 1]), previous[j] + 1, current[j - 1] + 1)
+            current[j] = cost if cost < over else over
+        if min(current[low - 1:high + 1]) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+def reveals(text, secret_key):
+    # Есть ли слово в сообщении того, кто рисует (в том числе через пробелы и знаки: "к о т")
+    return secret_key in normalize(text)
+
+
+def match(text, secret_key):
+    # CORRECT, CLOSE или WRONG
+    guess = normalize(text)
+    if guess == secret_key:
+        return CORRECT
+    limit = near_miss_limit(secret_key)
+    if limit and edit_distance(guess, secret_key, limit) is not None:
+        return CLOSE
+    return WRONG
@@ -0,0 +1,152 @@
+# Сервер без окна и без Qt (для контейнеров и машин без дисплея).
+# Вместо ведущего за окном раунды ведёт сам сервер: выбирает слово и того, кто рисует,
+# следит за временем и начисляет очки. Рисует игрок (кадры S), сервер рассылает его штрихи
+# остальным и повторяет их на холсте canvas.Canvas, из которого снимаются опорные кадры
+# журнала рисунка (canvas_log.py).
+#
+# Запуск: python design.py --headless --host 0.0.0.0 --port 12345 --engine asyncio
+#     или python headless.py с теми же параметрами
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from canvas import Canvas, CANVAS_WIDTH, CANVAS_HEIGHT
+from framing import pack_frame
+from protocol import STROKE, encode_stroke, pack_text
+from game_server import GameServer
+from recording import RECORD_FILE
+from words import random_word, WORDS_CATEGORY, WORDS_DIFFICULTY, DIFFICULTIES, BANK
+
+# Сколько секунд даётся на отгадку и сколько ждать перед следующим раундом
+ROUND_SECONDS = int(os.environ.get("PICTIONARY_ROUND_SECONDS", "60"))
+ROUND_PAUSE = 5
+MIN_PLAYERS = 2  # Один рисует, хотя бы один отгадывает
+TICK = 0.5  # Как часто проверять сроки раундов
+
+
+class HeadlessServer(GameServer):
+    def __init__(self, engine="threads", round_seconds=ROUND_SECONDS,
+                 category=WORDS_CATEGORY, difficulty=WORDS_DIFFICULTY, record=RECORD_FILE):
+        super().__init__(engine, record)
+        self.round_seconds = round_seconds
+        self.category = category  # Откуда брать слова: "" и 0 - из всех категорий и любой сложности
+        self.difficulty = difficulty
+        self.rounds_stopped = threading.Event()
+        self.round_thread = None
+
+    def serve(self, server_socket):
+        self.start_rounds()
+        super().serve(server_socket)
+
+    def start_rounds(self):
+        # Один поток на все комнаты: раз в TICK секунд начинает и заканчивает раунды
+        self.round_thread = threading.Thread(target=self.round_loop, daemon=True)
+        self.round_thread.start()
+
+    def show_message(self, message):
+        print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+    def register_client(self, conn, addr, room_name="", compression=(), live="", relay=False):
+        super().register_client(conn, addr, room_name, compression, live, relay)
+        room = conn.room
+        with room.canvas_log.lock:
+            if room.canvas is None:
+                # Опорные кадры - в разрешении комнаты, штрихи приходят в логическом
+                room.canvas = Canvas(*room.network_size, logical=(CANVAS_WIDTH, CANVAS_HEIGHT))
+
+    def round_loop(self):
+        while not self.rounds_stopped.wait(TICK):
+            now = time.monotonic()
+            for room in self.rooms.all_rooms():
+                try:
+                    self.tick_room(room, now)
+                except Exception as e:
+                    self.log(room, f"Ошибка: {e}")
+
+    def tick_room(self, room, now):
+        if room.round_ends_at is None:
+            if len(room.players()) >= MIN_PLAYERS and now >= room.next_round_at:
+                self.start_round(room, now)
+            return
+        if room.drawer not in room.clients:
+            self.end_round(room, "Рисующий вышел из игры.")
+        elif now >= room.round_ends_at:
+            self.end_round(room, "Время вышло!")
+
+    def start_round(self, room, now):
+        with room.lock:
+            clients = room.players()
+            # Рисуют по очереди: следующий после того, кто рисовал в прошлом раунде
+            index = clients.index(room.drawer) + 1 if room.drawer in clients else 0
+            drawer = clients[index % len(clients)]
+            word = random_word(self.category, self.difficulty)
+            room.secret_word = word
+            room.drawer = drawer
+            room.round_ends_at = now + self.round_seconds
+        with room.canvas_log.lock:
+            room.canvas.clear()
+            room.canvas_log.publish(pack_frame(STROKE, encode_stroke({"k": "clear"})), keyframe=True)
+        self.log(room, f"Новый раунд: рисует {drawer.nickname}, слово {word.text}")
+        self.broadcast_text(f"Новый раунд! Рисует {drawer.nickname}, на отгадку {self.round_seconds} секунд", room)
+        drawer.send(pack_text(f"Ваше слово: {word.text}"))
+
+    def end_round(self, room, reason):
+        # Раунд закончился без отгадки: называем слово и ждём следующего
+        with room.lock:
+            word = room.secret_word
+            if room.round_ends_at is None or word is None:
+                return  # Слово успели отгадать
+            room.secret_word = None
+            self.finish_round(room)
+        result_message = f"Загаданное слово: {word}!"
+        self.log(room, f"{reason} {result_message}")
+        self.broadcast_text(reason, room)
+        self.broadcast_text(result_message, room)
+
+    def finish_round(self, room):
+        # Вызывается под room.lock
+        room.round_ends_at = None
+        room.next_round_at = time.monotonic() + ROUND_PAUSE
+
+    def word_guessed(self, room):
+        self.finish_round(room)
+
+    def stop(self):
+        self.rounds_stopped.set()
+        super().stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Игровой сервер без окна")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--engine", choices=("threads", "asyncio"),
+                        default=os.environ.get("PICTIONARY_ENGINE", "threads"))
+    parser.add_argument("--round-seconds", type=int, default=ROUND_SECONDS)
+    parser.add_argument("--category", default=WORDS_CATEGORY, help="категория слов (имя словаря), по умолчанию любая")
+    parser.add_argument("--difficulty", type=int, choices=(0,) + DIFFICULTIES, default=WORDS_DIFFICULTY,
+                        help="сложность слов, 0 - любая")
+    parser.add_argument("--record", default=RECORD_FILE, help="записывать игру в файл (см. recording.py)")
+    args = parser.parse_args(argv)
+    if args.category and args.category not in BANK.categories():
+        parser.error(f"нет словаря {args.category}, есть: {', '.join(BANK.categories())}")
+
+    server = HeadlessServer(args.engine, args.round_seconds, args.category, args.difficulty, args.record)
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind((args.host, args.port))
+    server.show_message(f"Ожидается подключение на порту {args.port} ({args.engine})...")
+    try:
+        server.serve(server_socket)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
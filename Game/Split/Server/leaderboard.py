@@ -0,0 +1,141 @@
+# Очки игроков: таблица мест комнаты в памяти и хранилище очков на диске (SQLite).
+# Таблица мест - отсортированный список ключей (-очки, ник): место игрока ищется двоичным поиском,
+# первые K мест - это срез списка, поэтому начисление очков не пересортировывает всех игроков.
+# После начисления сервер рассылает только те места, которые поменялись.
+# Если задан файл (PICTIONARY_SCORES_DB), очки переживают перезапуск сервера: пишутся в SQLite
+# (режим WAL) пачками из отдельного потока, игрок, отгадавший слово, не ждёт диска.
+import bisect
+import os
+import sqlite3
+import threading
+
+# Файл с очками (рядом с ним SQLite держит ещё -wal и -shm); не задан - очки только в памяти,
+# чтобы сервер не оставлял файлов в каталоге, из которого его запустили
+SCORES_DB = os.environ.get("PICTIONARY_SCORES_DB", "")
+# Как часто (секунд) и после скольких изменений сбрасывать очки на диск
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH = 100
+# Сколько мест показывать игрокам
+TOP_PLAYERS = 10
+
+
+def format_places(title, places):
+    # places - [(место, ник, очки)]
+    lines = [title] + [f"{place}. {nickname}: {score} очков" for place, nickname, score in places]
+    return "\n".join(lines) + "\n"
+
+
+class Leaderboard:
+    def __init__(self):
+        self.scores = {}  # Ник -> очки
+        self.ranking = []  # Ключи (-очки, ник) по возрастанию: первое место - первый элемент
+
+    def load(self, scores):
+        self.scores = dict(scores)
+        self.ranking = sorted((-score, nickname) for nickname, score in self.scores.items())
+
+    def add(self, nickname, points):
+        # Начисляет очки; возвращает (прежнее место или None, новое место), места с нуля
+        old_score = self.scores.get(nickname)
+        old_place = None
+        if old_score is not None:
+            old_place = bisect.bisect_left(self.ranking, (-old_score, nickname))
+            del self.ranking[old_place]
+        score = (old_score or 0) + points
+        self.scores[nickname] = score
+        key = (-score, nickname)
+        new_place = bisect.bisect_left(self.ranking, key)
+        self.ranking.insert(new_place, key)
+        return old_place, new_place
+
+    def top(self, count=TOP_PLAYERS):
+        return [(place, nickname, -score)
+                for place, (score, nickname) in enumerate(self.ranking[:count], start=1)]
+
+    def changed(self, old_place, new_place, count=TOP_PLAYERS):
+        # Места из первых count, которые сдвинулись после add(): от нового места игрока до прежнего.
+        # Новый игрок сдвигает вниз всех, кто ниже него
+        last = len(self.ranking) - 1 if old_place is None else max(old_place, new_place)
+        first = new_place if old_place is None else min(old_place, new_place)
+        return [(place + 1, self.ranking[place][1], -self.ranking[place][0])
+                for place in range(first, min(last, count - 1) + 1)]
+
+
+class ScoreStore:
+    def __init__(self, path=SCORES_DB, flush_interval=FLUSH_INTERVAL, flush_batch=FLUSH_BATCH):
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        # Соединение общее для потоков, запросы идут под self.db_lock
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self.db_lock = threading.Lock()
+        # WAL: чтение при загрузке комнаты не ждёт записи, а рабочие процессы (shard.py) пишут в один файл
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS scores (room TEXT NOT NULL, nickname TEXT NOT NULL, "
+                        "score INTEGER NOT NULL, PRIMARY KEY (room, nickname))")
+        self.pending = {}  # (комната, ник) -> очки, ещё не записанные на диск
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target=self.flush_loop, daemon=True)
+        self.thread.start()
+
+    def load(self, room_name):
+        with self.db_lock:
+            rows = self.db.execute("SELECT nickname, score FROM scores WHERE room = ?", (room_name,)).fetchall()
+        scores = dict(rows)
+        # Комнату могли удалить и создать заново раньше, чем её очки дошли до диска
+        with self.condition:
+            scores.update((nickname, score) for (room, nickname), score in self.pending.items()
+                          if room == room_name)
+        return scores
+
+    def save(self, room_name, nickname, score):
+        with self.condition:
+            if self.closed:
+                return
+            self.pending[(room_name, nickname)] = score
+            if len(self.pending) >= self.flush_batch:
+                self.condition.notify()
+
+    def flush_loop(self):
+        while True:
+            with self.condition:
+                if not self.closed and len(self.pending) < self.flush_batch:
+                    self.condition.wait(self.flush_interval)
+                closed = self.closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self):
+        with self.condition:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return
+        # Вся пачка - одна транзакция
+        try:
+            with self.db_lock:
+                self.db.execute("BEGIN")
+                self.db.executemany("INSERT OR REPLACE INTO scores (room, nickname, score) VALUES (?, ?, ?)",
+                                    [(room, nickname, score) for (room, nickname), score in batch.items()])
+                self.db.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"Ошибка записи очков: {e}")
+            with self.db_lock:
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+            # Не теряем очки: вернём их в очередь, если новых для тех же игроков не появилось
+            with self.condition:
+                for key, score in batch.items():
+                    self.pending.setdefault(key, score)
+
+    def close(self):
+        # Дописывает всё, что накопилось, и закрывает файл
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        with self.db_lock:
+            self.db.close()
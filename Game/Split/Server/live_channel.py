@@ -0,0 +1,78 @@
+# Серверная сторона живого канала (формат - в live.py).
+# Сокет UDP на том же номере порта, что и TCP. Поток принимает HELLO от клиентов и запоминает
+# их адреса, publish рассылает состояние комнате прямо из вызывающего потока без ожидания:
+# если буфер сокета полон, датаграмма просто теряется.
+import os
+import socket
+import threading
+from itertools import count
+
+from live import pack_offer, unpack_hello, pack_state, TOKEN_SIZE, MAX_DATAGRAM
+import metrics
+
+# Отправка без ожидания; где флага нет (Windows), sendto по UDP и так почти не ждёт
+SEND_FLAGS = getattr(socket, "MSG_DONTWAIT", 0)
+
+
+class LiveChannel:
+    def __init__(self, address):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(address)
+        self.port = self.sock.getsockname()[1]
+        self.connections = {}  # Ключ -> соединение
+        self.seq = count(1)
+        self.lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self.receive_loop, daemon=True)
+        self.thread.start()
+
+    def register(self, conn):
+        # Кадр LIVE для ответа на рукопожатие
+        token = conn.live_token = os.urandom(TOKEN_SIZE)
+        with self.lock:
+            self.connections[token] = conn
+        return pack_offer(self.port, token)
+
+    def forget(self, conn):
+        with self.lock:
+            self.connections.pop(conn.live_token, None)
+        conn.live_addr = None
+
+    def receive_loop(self):
+        while not self.closed:
+            try:
+                data, addr = self.sock.recvfrom(MAX_DATAGRAM)
+            except OSError:
+                return
+            token = unpack_hello(data)
+            if token is None:
+                continue
+            with self.lock:
+                conn = self.connections.get(token)
+            if conn is not None:
+                conn.live_addr = addr
+
+    def publish(self, room, state):
+        data = pack_state(next(self.seq) & 0xFFFFFFFF, state)
+        sent = 0
+        for conn in room.clients:
+            addr = conn.live_addr
+            if addr is None:
+                continue
+            try:
+                self.sock.sendto(data, SEND_FLAGS, addr)
+                sent += 1
+            except OSError:
+                pass  # Буфер полон или клиент недоступен: следующая датаграмма всё равно заменит эту
+        if sent:
+            metrics.LIVE_DATAGRAMS.inc(room.name, amount=sent)
+
+    def close(self):
+        self.closed = True
+        try:
+            # Будим поток в recvfrom: после shutdown он вернёт пустую датаграмму или ошибку
+            # (ENOTCONN у сокета без соединения - но поток всё равно просыпается)
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
@@ -0,0 +1,197 @@
+# Метрики сервера: счётчики и гистограммы в памяти процесса.
+# Снаружи их видно в текстовом формате Prometheus:
+#   PICTIONARY_METRICS_PORT=9100 - по HTTP на 127.0.0.1:9100 (любой путь, например /metrics);
+#   PICTIONARY_METRICS_FILE=/tmp/pictionary.prom - раз в PICTIONARY_METRICS_INTERVAL секунд в файл.
+# Запись метрики - это блокировка и сложение, поэтому метрики можно не выключать.
+# Всё, что дёшево посчитать только в момент чтения (игроки, очереди), отдают сборщики (add_collector).
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.environ.get("PICTIONARY_METRICS_PORT", "0"))
+METRICS_FILE = os.environ.get("PICTIONARY_METRICS_FILE", "")
+METRICS_INTERVAL = float(os.environ.get("PICTIONARY_METRICS_INTERVAL", "10"))
+
+# Границы корзин гистограмм времени, в секундах
+TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_metrics = []
+_collectors = []
+_started = False
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+        self.values = {}
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.values.items())
+        lines += [f"{self.name}{_labels(self.label_names, labels)} {value}" for labels, value in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+        self.buckets = buckets
+        self.values = {}  # метки -> [счётчики по корзинам..., сумма, количество]
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                counts = self.values[labels] = [0] * (len(self.buckets) + 3)
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = sorted((labels, list(counts)) for labels, counts in self.values.items())
+        for labels, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {counts[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {counts[-1]}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+def gauge(name, help_text, samples, labels=()):
+    # Для сборщиков: samples - [(значения меток, значение)]
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    lines += [f"{name}{_labels(labels, values)} {value}" for values, value in samples]
+    return lines
+
+
+def add_collector(collector):
+    # collector() возвращает строки метрик; вызывается при каждом чтении
+    with _lock:
+        _collectors.append(collector)
+
+
+def remove_collector(collector):
+    with _lock:
+        if collector in _collectors:
+            _collectors.remove(collector)
+
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    with _lock:
+        collectors = list(_collectors)
+    for collector in collectors:
+        try:
+            lines += collector()
+        except Exception as e:
+            lines.append(f"# сборщик метрик упал: {e}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Не засоряем вывод сервера запросами метрик
+
+
+def _dump_loop(path):
+    while True:
+        time.sleep(METRICS_INTERVAL)
+        try:
+            # Через временный файл: читатель никогда не увидит файл наполовину записанным
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(render())
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Ошибка записи метрик: {e}")
+
+
+def start(port=METRICS_PORT, path=METRICS_FILE, worker=None):
+    # Включает то, что задано в окружении; повторный вызов ничего не делает.
+    # worker - номер рабочего процесса (shard.py): у каждого свой порт и свой файл
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    if worker is not None:
+        port = port + 1 + worker if port else 0
+        path = f"{path}.{worker}" if path else ""
+    if port:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    if path:
+        threading.Thread(target=_dump_loop, args=(path,), daemon=True).start()
+
+
+# Метрики, которые пишет сервер
+FRAMES_SENT = Counter("pictionary_frames_sent_total", "Кадров отправлено клиентам", ("type", "room"))
+BYTES_SENT = Counter("pictionary_bytes_sent_total", "Байт отправлено клиентам (после сжатия)", ("type", "room"))
+FRAMES_RECEIVED = Counter("pictionary_frames_received_total", "Кадров получено от клиентов", ("type",))
+FRAMES_DROPPED = Counter("pictionary_frames_dropped_total", "Кадров рисунка выброшено из переполненных очередей")
+DISCONNECTS = Counter("pictionary_slow_disconnects_total", "Клиентов отключено за переполненную очередь")
+LIVE_DATAGRAMS = Counter("pictionary_live_datagrams_total", "Датаграмм живого канала отправлено", ("room",))
+GUESSES = Counter("pictionary_guesses_total", "Попыток отгадать слово", ("room", "result"))
+SEND_SECONDS = Histogram("pictionary_send_seconds", "Время одной записи в сокет (пачки кадров)")
+FRAMES_PER_WRITE = Histogram("pictionary_frames_per_write", "Кадров в одной записи в сокет",
+                             buckets=(1, 2, 4, 8, 16, 32, 64))
+ENCODE_SECONDS = Histogram("pictionary_encode_seconds", "Время кодирования картинки холста", ("kind",))
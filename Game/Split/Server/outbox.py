@@ -0,0 +1,225 @@
+# Исходящая очередь для каждого клиента.
+# Все рассылки только кладут готовые кадры в очередь клиента, а пишет в сокет
+# отдельный поток. Медленный клиент копит очередь у себя и не тормозит остальных.
+import os
+import socket
+import threading
+import time
+from collections import deque
+
+from framing import frame_size, send_frames
+from compression import FrameCodec
+import metrics
+
+# Что делать с клиентом, который не успевает забирать данные:
+# "drop" - выбрасывать устаревшие кадры рисунка (чат и счёт не трогаем),
+# "disconnect" - отключать, если очередь переполнена дольше OUTBOX_GRACE секунд
+OUTBOX_POLICY = os.environ.get("PICTIONARY_OUTBOX_POLICY", "drop")
+OUTBOX_BYTES = int(os.environ.get("PICTIONARY_OUTBOX_BYTES", str(1024 * 1024)))
+OUTBOX_GRACE = float(os.environ.get("PICTIONARY_OUTBOX_GRACE", "5"))
+# Во сколько раз очередь может превысить лимит, прежде чем клиента отключат при любой политике
+OUTBOX_HARD_FACTOR = 4
+# Сколько кадров (и байт) из очереди отправлять одной записью в сокет.
+# Кадров не больше, чем частей в одном sendmsg (IOV_MAX, обычно 1024): у кадра две части
+BATCH_FRAMES = 64
+BATCH_BYTES = 256 * 1024
+# Сколько секунд поток отправки, проснувшись на первый кадр, ждёт остальные кадры того же всплеска
+# (сообщение чата, итог раунда и топ) - тогда они уйдут одной записью. 0 - отправлять сразу
+OUTBOX_LINGER = float(os.environ.get("PICTIONARY_OUTBOX_LINGER", "0.003"))
+
+
+class ClientConnection:
+    def __init__(self, sock, nickname, on_event=None, policy=OUTBOX_POLICY, max_bytes=OUTBOX_BYTES):
+        self.sock = sock
+        self.nickname = nickname
+        self.room = None  # Комната, в которой играет клиент
+        self.record_id = 0  # Номер соединения в записи игры (recording.py)
+        self.relay = False  # Ретранслятор для зрителей (relay.py): только смотрит и получает опорные кадры
+        # Живой канал (live.py): ключ из ответа на рукопожатие и адрес, с которого клиент прислал HELLO
+        self.live_token = None
+        self.live_addr = None
+        # Сжатие кадров; способы включает сервер после рукопожатия. Сжимает поток отправки,
+        # уже после того как решено, какие кадры выбросить: поток zlib не терпит пропусков
+        self.codec = FrameCodec()
+        # Для метрик: сколько байт ушло этому клиенту и сколько времени заняла отправка
+        self.bytes_sent = 0
+        self.send_seconds = 0.0
+        # on_event(conn, "drain") - очередь разгребли после потери кадров, пора прислать весь холст;
+        # on_event(conn, "disconnect") - клиент отключён за переполнение
+        self.on_event = on_event
+        self.policy = policy
+        self.max_bytes = max_bytes
+        self.synced = False  # Есть ли у клиента актуальный холст целиком
+        self.needs_keyframe = False
+        self.frames = deque()  # (кадр, можно ли выбросить)
+        self.queued_bytes = 0
+        self.over_budget_since = None
+        self.closed = False
+        self.condition = threading.Condition()
+        self.start_writer()
+
+    def start_writer(self):
+        self.writer_thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer_thread.start()
+
+    def wake_writer(self):
+        # Вызывается под self.condition, когда в очереди появился кадр или соединение закрыто
+        self.condition.notify()
+
+    def send(self, frame, droppable=False):
+        # droppable=True для кадров рисунка: их можно выбросить и потом прислать весь холст заново
+        dropped = False
+        drained = False
+        disconnect = False
+        with self.condition:
+            if self.closed:
+                return False
+            # В пустую очередь кадр кладём всегда, даже если он сам больше лимита
+            if self.queued_bytes and self.queued_bytes + frame_size(frame) > self.max_bytes and self.policy == "drop":
+                purged = self.drop_canvas_frames()
+                if purged or droppable:
+                    self.synced = False
+                    self.needs_keyframe = True
+                    dropped = True
+                    metrics.FRAMES_DROPPED.inc(amount=purged + droppable)
+                    # Выбросили всё, а в сокет ничего не пишется: после записи холст никто не попросит,
+                    # просим сейчас
+                    if droppable and not self.queued_bytes:
+                        self.needs_keyframe = False
+                        drained = True
+            if not (dropped and droppable):
+                self.frames.append((frame, droppable))
+                self.queued_bytes += frame_size(frame)
+                self.wake_writer()
+                disconnect = self.queued_bytes > frame_size(frame) and self.over_budget()
+        if disconnect:
+            metrics.DISCONNECTS.inc()
+            self.close()
+            if self.on_event:
+                self.on_event(self, "disconnect")
+        if drained and self.on_event:
+            self.on_event(self, "drain")
+        return not (dropped and droppable) and not disconnect
+
+    def send_snapshot(self, frames):
+        # Весь холст (опорный кадр и журнал) кладём в очередь целиком, как один кадр:
+        # его размер ограничен журналом, а выбросить его часть - значит снова остаться без холста
+        with self.condition:
+            if self.closed:
+                return False
+            for frame in frames:
+                self.frames.append((frame, False))
+                self.queued_bytes += frame_size(frame)
+            self.wake_writer()
+        return True
+
+    def drop_canvas_frames(self):
+        kept = deque()
+        dropped = 0
+        for frame, droppable in self.frames:
+            if droppable:
+                self.queued_bytes -= frame_size(frame)
+                dropped += 1
+            else:
+                kept.append((frame, droppable))
+        self.frames = kept
+        return dropped
+
+    def over_budget(self):
+        if self.queued_bytes > self.max_bytes * OUTBOX_HARD_FACTOR:
+            return True
+        if self.queued_bytes <= self.max_bytes:
+            self.over_budget_since = None
+            return False
+        if self.policy != "disconnect":
+            return False
+        now = time.monotonic()
+        if self.over_budget_since is None:
+            self.over_budget_since = now
+        return now - self.over_budget_since > OUTBOX_GRACE
+
+    def write_loop(self):
+        while True:
+            with self.condition:
+                idle = not self.frames
+                while not self.closed and not self.frames:
+                    self.condition.wait()
+            if idle and OUTBOX_LINGER:
+                # Если поток был занят записью, кадры и так успели накопиться
+                time.sleep(OUTBOX_LINGER)
+            with self.condition:
+                if self.closed:
+                    return
+                frames = self.take_batch()
+            try:
+                wire_frames = [self.codec.encode(frame) for frame in frames]
+                started = time.perf_counter()
+                send_frames(self.sock, wire_frames)
+                self.record_sent(wire_frames, time.perf_counter() - started)
+            except Exception as e:
+                print(f"Ошибка отправки клиенту {self.nickname}: {e}")
+                self.close()
+                return
+            if not self.frames_sent(frames):
+                return
+
+    def take_batch(self):
+        # Вызывается под self.condition: всё, что накопилось в начале очереди, уйдёт одной записью.
+        # Пока идёт запись, рассылки кладут в очередь следующую пачку
+        frames = [self.frames.popleft()[0]]
+        size = frame_size(frames[0])
+        while self.frames and len(frames) < BATCH_FRAMES:
+            frame = self.frames[0][0]
+            size += frame_size(frame)
+            if size > BATCH_BYTES:
+                break
+            frames.append(frame)
+            self.frames.popleft()
+        return frames
+
+    def record_sent(self, wire_frames, seconds):
+        room = self.room.name if self.room else ""
+        for wire_frame in wire_frames:
+            size = frame_size(wire_frame)
+            frame_type = chr(wire_frame[0][0] & 0x7f)  # Без флага сжатия
+            metrics.FRAMES_SENT.inc(frame_type, room)
+            metrics.BYTES_SENT.inc(frame_type, room, amount=size)
+            self.bytes_sent += size
+        metrics.SEND_SECONDS.observe(seconds)
+        metrics.FRAMES_PER_WRITE.observe(len(wire_frames))
+        self.send_seconds += seconds
+
+    def frames_sent(self, frames):
+        # Учитываем отправленные кадры; False - соединение уже закрыто
+        drained = False
+        with self.condition:
+            if self.closed:
+                return False
+            self.queued_bytes -= sum(frame_size(frame) for frame in frames)
+            if self.queued_bytes <= self.max_bytes:
+                self.over_budget_since = None
+            if not self.frames and self.needs_keyframe:
+                # Весь холст просим только когда очередь пуста, иначе он тоже потеряется
+                self.needs_keyframe = False
+                drained = True
+        if drained and self.on_event:
+            self.on_event(self, "drain")
+        return True
+
+    def close(self):
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.frames.clear()
+            self.queued_bytes = 0
+            self.wake_writer()
+        self.close_transport()
+
+    def close_transport(self):
+        try:
+            # shutdown будит поток, который ждёт данных от клиента в recv
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
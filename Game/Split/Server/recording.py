@@ -0,0 +1,184 @@
+# Запись игры в файл: рукопожатия, кадры от игроков (чат, догадки, штрихи) и всё, что сервер
+# рассылает комнатам (чат, итоги раундов, топ игроков, кадры рисунка). Нужна, чтобы разобрать
+# случай с боевого сервера у себя и чтобы гонять нагрузочный тест живым трафиком (bench/replay.py).
+#
+# Файл только дописывается: заголовок MAGIC, дальше записи RECORD + комната + данные.
+# Данные кадров - как в протоколе (framing.py), но без сжатия. Рядом лежит индекс <файл>.idx:
+# раз в INDEX_INTERVAL секунд пара (время, смещение записи), по нему чтение начинается
+# с любого момента, не просматривая файл с начала. Запись включается PICTIONARY_RECORD=<файл>
+# или --record у headless.py.
+#
+# Просмотр: python recording.py game.rec [--from ВРЕМЯ] [--limit N]
+import argparse
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime
+from itertools import count
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from framing import HEADER, frame_size, pack_frame
+from protocol import TEXT, STROKE
+
+RECORD_FILE = os.environ.get("PICTIONARY_RECORD", "")
+MAGIC = b"PICTREC1"
+RECORD = struct.Struct(">dcIHI")  # Время (time.time()), вид, номер соединения, длина комнаты, длина данных
+INDEX = struct.Struct(">dQ")  # Время, смещение записи
+INDEX_INTERVAL = 1.0
+
+# Виды записей
+HANDSHAKE = b"H"  # Игрок подключился; данные - рукопожатие (protocol.make_handshake)
+CLIENT_FRAME = b"C"  # Кадр от игрока
+BROADCAST = b"B"  # Кадр, разосланный всей комнате; номер соединения 0
+DISCONNECT = b"X"  # Игрок отключился
+
+Record = namedtuple("Record", "time kind conn room data")
+
+
+class Recorder:
+    def __init__(self, path, index_interval=INDEX_INTERVAL):
+        self.path = path
+        self.index_interval = index_interval
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.index = open(path + ".idx", "ab")
+        self.next_index = 0.0
+        self.ids = count(1)
+        self.closed = False
+        # Пишут все потоки сервера; под блокировкой только запись в буфер файла
+        self.lock = threading.Lock()
+
+    def write(self, kind, conn_id, room_name, parts):
+        # parts - куски данных (кадр из framing.pack_frame или одна строка байт)
+        now = time.time()
+        room = room_name.encode()
+        with self.lock:
+            if self.closed:
+                return
+            if now >= self.next_index:
+                # Индекс указывает только на то, что уже на диске: после сбоя по нему можно читать
+                offset = self.file.tell()
+                self.file.flush()
+                self.index.write(INDEX.pack(now, offset))
+                self.index.flush()
+                self.next_index = now + self.index_interval
+            self.file.write(RECORD.pack(now, kind, conn_id, len(room), frame_size(parts)))
+            self.file.write(room)
+            for part in parts:
+                self.file.write(part)
+
+    def handshake(self, conn, room_name, handshake):
+        conn.record_id = next(self.ids)
+        self.write(HANDSHAKE, conn.record_id, room_name, (handshake,))
+
+    def client_frame(self, conn, frame_type, payload):
+        self.write(CLIENT_FRAME, conn.record_id, conn.room.name, pack_frame(frame_type, payload))
+
+    def broadcast(self, room_name, frame):
+        self.write(BROADCAST, 0, room_name, frame)
+
+    def disconnect(self, conn):
+        self.write(DISCONNECT, conn.record_id, conn.room.name if conn.room else "", (b"",))
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.file.close()
+            self.index.close()
+
+
+class Recording:
+    # Чтение записи через mmap: записи разбираются прямо из отображённого файла
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: это не запись игры")
+        self.index_times = array("d")
+        self.index_offsets = array("Q")
+        try:
+            with open(path + ".idx", "rb") as f:
+                index = f.read()
+        except OSError:
+            index = b""  # Без индекса читаем с начала
+        for at, offset in INDEX.iter_unpack(index[:len(index) - len(index) % INDEX.size]):
+            if offset <= len(self.data):
+                self.index_times.append(at)
+                self.index_offsets.append(offset)
+
+    def records(self, offset=None):
+        # Записи от смещения до конца; недописанная последняя запись (сбой при записи) пропускается
+        data = self.data
+        offset = len(MAGIC) if offset is None else offset
+        while offset + RECORD.size <= len(data):
+            at, kind, conn, room_length, length = RECORD.unpack_from(data, offset)
+            start = offset + RECORD.size
+            end = start + room_length + length
+            if end > len(data):
+                return
+            yield Record(at, kind, conn, data[start:start + room_length].decode(), data[start + room_length:end])
+            offset = end
+
+    def seek(self, timestamp):
+        # Смещение, с которого начинать чтение, чтобы не пропустить записи начиная с timestamp
+        position = bisect_right(self.index_times, timestamp) - 1
+        return self.index_offsets[position] if position >= 0 else len(MAGIC)
+
+    def records_from(self, timestamp):
+        for record in self.records(self.seek(timestamp)):
+            if record.time >= timestamp:
+                yield record
+
+    def start_time(self):
+        return next((record.time for record in self.records()), None)
+
+    def close(self):
+        self.data.close()
+
+
+def describe(record):
+    # Строка для просмотра записи человеком
+    when = datetime.fromtimestamp(record.time).strftime("%H:%M:%S.%f")[:-3]
+    kind = {HANDSHAKE: "подключение", CLIENT_FRAME: "от игрока", BROADCAST: "комнате",
+            DISCONNECT: "отключение"}[record.kind]
+    text = ""
+    if record.kind == HANDSHAKE:
+        text = record.data.decode(errors="replace").replace("\n", " | ")
+    elif record.kind in (CLIENT_FRAME, BROADCAST):
+        frame_type, length = HEADER.unpack_from(record.data)
+        payload = record.data[HEADER.size:]
+        text = f"{frame_type.decode()} {length} байт"
+        if frame_type in (TEXT, STROKE):
+            text += ": " + payload.decode(errors="replace").replace("\n", " | ")
+    return f"{when} #{record.conn} [{record.room}] {kind} {text}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Просмотр записи игры")
+    parser.add_argument("path")
+    parser.add_argument("--from", dest="start", type=float, help="с какого времени (секунд от начала записи)")
+    parser.add_argument("--limit", type=int, default=0, help="сколько записей показать, 0 - все")
+    args = parser.parse_args(argv)
+
+    recording = Recording(args.path)
+    started = recording.start_time()
+    if started is None:
+        return  # Запись пустая
+    records = recording.records() if args.start is None else recording.records_from(started + args.start)
+    for shown, record in enumerate(records, start=1):
+        print(describe(record))
+        if shown == args.limit:
+            break
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+# Ретранслятор для зрителей: отдельный процесс, который один раз подключается к серверу
+# (или к другому ретранслятору) как зритель и раздаёт чат и рисунок комнаты своим подключениям.
+# Сервер тратит на всех зрителей ретранслятора одну очередь и одну копию кадров,
+# поэтому смотреть игру могут тысячи, не нагружая сервер игры.
+#
+# Ретранслятор держит у себя такой же журнал рисунка (canvas_log.py), как сервер: опорные кадры
+# сервер присылает ему завёрнутыми в KEYFRAME, остальные кадры рисунка - как всем. Новый зритель
+# получает холст из журнала ретранслятора, сервер о нём не узнаёт. Зрители подключаются
+# тем же протоколом, что игроки, но только смотрят: чат и штрихи от них не принимаются.
+# Ретранслятор представляется ретранслятором и своим зрителям-ретрансляторам (make_handshake),
+# поэтому их можно выстраивать цепочкой: сервер -> ретранслятор -> ретранслятор -> зрители.
+# Живого канала (live.py) через ретранслятор нет: зрители видят только законченные штрихи.
+#
+# Запуск: python relay.py --upstream-host game.example --upstream-port 12345 --room main --port 12346
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from framing import HEADER, pack_frame, check_length
+from protocol import TEXT, IMAGE, STROKE, DELTA, CAPS, TILES, PALETTE, KEYFRAME, CANVAS, make_handshake, pack_text, \
+    parse_capabilities, pack_capabilities, unpack_keyframe
+from compression import FrameCodec, SUPPORTED, negotiate
+from rooms import Room, DEFAULT_ROOM
+from tiles import pack_tiles, unpack_tiles, pack_tile_request, unpack_tile_request, NO_POSITION
+import aio_server
+
+RECONNECT_DELAY = 1.0  # Первая пауза перед переподключением к серверу, дальше вдвое больше
+MAX_RECONNECT_DELAY = 30.0
+# Сколько плиток зритель может попросить одним кадром, как у сервера (game_server.py)
+MAX_TILE_REQUEST = 256
+
+
+class Relay:
+    # Для aio_server.handle_connection выглядит как GameServer с одной комнатой
+    def __init__(self, upstream, room_name=DEFAULT_ROOM, nickname="Ретранслятор"):
+        self.upstream = upstream  # (хост, порт) сервера или ретранслятора выше по цепочке
+        self.nickname = nickname
+        self.room = Room(room_name or DEFAULT_ROOM)
+        self.running = False
+        self.recorder = None  # Запись игры ведёт сервер
+        self.aio_loop = None
+        self.aio_stopped = None
+        self.ready = None  # Событие: холст от сервера получен, можно пускать зрителей
+        self.canvas_frame = None  # Кадр CANVAS сервера: зрителям - тот же размер холста
+        self.writer = None  # Соединение с сервером
+        self.codec = None
+        self.joined = False  # Получен холст: дальше текст - рассылки комнате, а не ответы ретранслятору
+        self.pending_tiles = {}  # Хеш плитки, которую попросили у сервера -> кто её ждёт
+        # Топ комнаты: место -> строка. Весь топ сервер присылает только при входе, дальше - изменения,
+        # поэтому ретранслятор собирает его сам и отдаёт целиком каждому новому зрителю
+        self.top_places = {}
+
+    async def run(self, server_socket):
+        self.running = True
+        self.ready = asyncio.Event()
+        upstream_task = asyncio.create_task(self.upstream_loop())
+        try:
+            # Пока нет холста и размера холста, зрителям нечего отдать
+            await self.ready.wait()
+            server_socket.listen(socket.SOMAXCONN)
+            await aio_server.serve(self, server_socket)
+        finally:
+            upstream_task.cancel()
+
+    async def upstream_loop(self):
+        delay = RECONNECT_DELAY
+        while self.running:
+            try:
+                reader, self.writer = await asyncio.open_connection(*self.upstream)
+                self.codec = FrameCodec()
+                self.joined = False
+                self.writer.write(make_handshake(self.nickname, self.room.name, SUPPORTED, relay=True))
+                self.log(f"Подключён к {self.upstream[0]}:{self.upstream[1]}")
+                while True:
+                    frame_type, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+                    check_length(length)
+                    frame_type, payload = self.codec.decode(frame_type, await reader.readexactly(length))
+                    self.upstream_frame(frame_type, bytes(payload))
+                    delay = RECONNECT_DELAY
+            except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+                self.log(f"Нет связи с сервером: {e or 'соединение закрыто'}")
+            except ValueError as e:
+                # Ошибка протокола (слишком большой или битый кадр) - переподключаемся
+                self.log(f"Ошибка: {e}")
+            finally:
+                if self.writer:
+                    self.writer.close()
+                    self.writer = None
+                self.pending_tiles.clear()
+            # Зрители остаются и видят последний холст; после переподключения сервер пришлёт новый
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def upstream_frame(self, frame_type, payload):
+        log = self.room.canvas_log
+        if frame_type == CAPS:
+            self.codec.enable(parse_capabilities(payload))
+        elif frame_type == CANVAS:
+            self.canvas_frame = pack_frame(CANVAS, payload)
+        elif frame_type == TEXT:
+            self.note_top(payload.decode())
+            # До холста сервер пишет только самому ретранслятору (приветствие, весь топ),
+            # зрителям это не рассылаем: топ они получат при входе из top_places
+            if self.joined:
+                frame = pack_frame(TEXT, payload)
+                for conn in self.room.clients:
+                    conn.send(frame)
+        elif frame_type == KEYFRAME:
+            broadcast, keep, frame = unpack_keyframe(payload)
+            self.store_tiles(frame)
+            if broadcast:
+                log.publish(frame, keyframe=True)
+            else:
+                # Сервер сжал журнал - начинаем свой заново с того же кадра и тех же последних кадров
+                log.reset(frame, keep)
+            if not self.joined:
+                self.joined = True
+                self.ready.set()
+        elif frame_type == PALETTE:
+            log.publish_palette(pack_frame(PALETTE, payload))
+        elif frame_type == TILES and payload and self.is_tile_reply(payload):
+            self.tiles_received(payload)
+        elif frame_type in (STROKE, DELTA, TILES, IMAGE):
+            frame = pack_frame(frame_type, payload)
+            self.store_tiles(frame)
+            # Журнал сжимает сервер и присылает опорный кадр сам, поэтому ответ publish не нужен
+            log.publish(frame)
+
+    def note_top(self, message):
+        # Как у клиента (update_top_places): "Топ игроков:" - весь топ, "(изменения)" - сдвинувшиеся места
+        title, _, lines = message.partition("\n")
+        if not title.startswith("Топ игроков"):
+            return
+        if title == "Топ игроков:":
+            self.top_places = {}
+        for line in lines.splitlines():
+            place = line.partition(". ")[0]
+            if place.isdigit():
+                self.top_places[int(place)] = line
+
+    def top_message(self):
+        places = self.top_places
+        if not places:
+            return None
+        return "\n".join(["Топ игроков:"] + [places[place] for place in sorted(places)]) + "\n"
+
+    @staticmethod
+    def is_tile_reply(payload):
+        # Ответ на запрос плиток: у плиток нет места на холсте
+        return next(unpack_tiles(payload))[0] == NO_POSITION
+
+    def store_tiles(self, frame):
+        # Картинки плиток запоминаем, чтобы отвечать зрителям, не спрашивая сервер
+        header, payload = frame
+        if header[:1] != TILES:
+            return
+        for _, _, digest, data in unpack_tiles(payload):
+            if data:
+                self.room.tiles.put(digest, bytes(data))
+
+    def tiles_received(self, payload):
+        waiting = {}
+        for _, _, digest, data in unpack_tiles(payload):
+            data = bytes(data)
+            self.room.tiles.put(digest, data)
+            for conn in self.pending_tiles.pop(digest, ()):
+                waiting.setdefault(conn, []).append((NO_POSITION, NO_POSITION, digest, data))
+        for conn, entries in waiting.items():
+            conn.send(pack_tiles(entries))
+
+    def register_client(self, conn, addr, room_name="", compression=(), live="", relay=False):
+        # То же рукопожатие, что у GameServer, но комната одна и живого канала нет
+        if compression:
+            accepted = negotiate(compression)
+            conn.send(pack_capabilities(accepted))
+            conn.codec.enable(accepted)
+        conn.room = self.room
+        conn.relay = relay
+        if room_name and room_name != self.room.name:
+            self.log(f"{conn.nickname} просил комнату {room_name}, а здесь трансляция {self.room.name}")
+        if self.canvas_frame:
+            conn.send(self.canvas_frame)
+        conn.send(pack_text(f"Добро пожаловать! Трансляция комнаты {self.room.name}, только просмотр"))
+        top = self.top_message()
+        if top:
+            conn.send(pack_text(top))
+        self.room.canvas_log.join(conn)
+        self.log(f"Подключился {'ретранслятор' if relay else 'зритель'}: {conn.nickname} ({addr[0]})")
+
+    def remove_client(self, conn):
+        conn.close()
+        self.room.remove_client(conn)
+        for waiting in self.pending_tiles.values():
+            waiting.discard(conn)
+
+    def client_event(self, conn, event):
+        if event == "drain":
+            self.room.canvas_log.resync(conn)
+        elif event == "disconnect":
+            self.log(f"Зритель {conn.nickname} отключён: не успевает получать данные")
+
+    def handle_text(self, conn, text):
+        pass  # Зрители только смотрят
+
+    def handle_stroke(self, conn, payload):
+        pass
+
+    def handle_tile_request(self, conn, payload):
+        # Плитки из своего кэша сразу, остальные - у сервера (вызывается в цикле событий, как и чтение сервера)
+        entries = []
+        missing = []
+        for digest in unpack_tile_request(payload)[:MAX_TILE_REQUEST]:
+            data = self.room.tiles.get(digest)
+            if data is not None:
+                entries.append((NO_POSITION, NO_POSITION, digest, data))
+            elif self.writer and self.joined:
+                # Пока сервер не ответил на рукопожатие, кадры ему слать нельзя - плитку не получить
+                if digest not in self.pending_tiles:
+                    missing.append(digest)
+                self.pending_tiles.setdefault(digest, set()).add(conn)
+        if entries:
+            conn.send(pack_tiles(entries))
+        if missing:
+            self.writer.writelines(self.codec.encode(pack_tile_request(missing)))
+
+    def log(self, room_or_message, message=None):
+        # Вызывается и как GameServer.log(room, message)
+        message = room_or_message if message is None else message
+        print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+    def stop(self):
+        self.running = False
+        for conn in self.room.clients:
+            conn.close()
+        if self.aio_loop:
+            try:
+                self.aio_loop.call_soon_threadsafe(self.aio_stopped.set)
+            except RuntimeError:
+                pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ретранслятор игры для зрителей")
+    parser.add_argument("--upstream-host", default="127.0.0.1", help="сервер игры или другой ретранслятор")
+    parser.add_argument("--upstream-port", type=int, default=12345)
+    parser.add_argument("--room", default=DEFAULT_ROOM, help="какую комнату транслировать")
+    parser.add_argument("--nickname", default="Ретранслятор", help="под каким ником подключаться к серверу")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=12346)
+    args = parser.parse_args(argv)
+
+    relay = Relay((args.upstream_host, args.upstream_port), args.room, args.nickname)
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind((args.host, args.port))
+    relay.log(f"Трансляция комнаты {relay.room.name} на порту {args.port}")
+    try:
+        asyncio.run(relay.run(server_socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        relay.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Комнаты: несколько независимых игр в одном процессе сервера.
+# У каждой комнаты своё загаданное слово, свои очки, свой холст и свои игроки,
+# рассылки идут только участникам комнаты.
+import threading
+
+from canvas_log import CanvasLog
+from leaderboard import Leaderboard
+from words import Word, normalize
+from tiles import TileCache, SERVER_STORE_TILES
+from canvas import network_size
+
+DEFAULT_ROOM = "main"
+
+
+class Room:
+    def __init__(self, name, recorder=None):
+        self.name = name
+        self.recorder = recorder  # Запись игры (recording.py): сюда же пишутся рассылки комнате
+        self.secret_word = None  # Строка или Word из банка слов; вместе с ней задаётся secret_key
+        self.leaderboard = Leaderboard()  # Меняется под self.lock
+        self.clients = []
+        self.joined = 0  # Сколько подключений комната приняла за всё время (shard.py сверяет с отданными)
+        self.draw_area = None  # Холст комнаты (у комнаты ведущего - DrawArea в окне сервера)
+        self.canvas_log = CanvasLog(self)  # Опорный кадр и журнал рисунка для новых игроков
+        self.network_size = network_size()  # В каком разрешении картинки холста идут игрокам (canvas.py)
+        self.tiles = TileCache(SERVER_STORE_TILES)  # PNG плиток холста по хешу (режим плиток)
+        # Раунды без окна ведущего (headless.py): кто рисует, холст на чистом Python и сроки раунда
+        self.drawer = None
+        self.canvas = None  # Меняется под canvas_log.lock
+        self.round_ends_at = None
+        self.next_round_at = 0.0
+        self.lock = threading.Lock()  # Чтобы два игрока не отгадали одно слово одновременно
+
+    @property
+    def secret_word(self):
+        return self._secret_word
+
+    @secret_word.setter
+    def secret_word(self, word):
+        # Форма для сравнения с догадками считается один раз на раунд, у слов из банка она готовая
+        if isinstance(word, Word):
+            self._secret_word, self.secret_key = word.text, word.normalized
+        else:
+            self._secret_word, self.secret_key = word, normalize(word) if word else None
+
+    def players(self):
+        # Без ретрансляторов: они не играют и не рисуют
+        return [conn for conn in self.clients if not conn.relay]
+
+    def add_client(self, conn):
+        with self.lock:
+            self.clients = self.clients + [conn]
+            self.joined += 1
+
+    def remove_client(self, conn):
+        with self.lock:
+            self.clients = [client for client in self.clients if client is not conn]
+
+
+class RoomRegistry:
+    def __init__(self, scores=None, recorder=None):
+        self.rooms = {}
+        self.scores = scores  # ScoreStore: очки комнаты загружаются при её создании
+        self.recorder = recorder
+        self.lock = threading.Lock()
+
+    def get_or_create(self, name):
+        name = name.strip() or DEFAULT_ROOM
+        with self.lock:
+            room = self.rooms.get(name)
+            if room is None:
+                room = Room(name, self.recorder)
+                if self.scores:
+                    room.leaderboard.load(self.scores.load(name))
+                self.rooms[name] = room
+            return room
+
+    def remove_if_empty(self, room):
+        # Комнату ведущего не удаляем, даже если из неё все вышли. True - комната удалена
+        with self.lock:
+            if not room.clients and room.name != DEFAULT_ROOM and self.rooms.get(room.name) is room:
+                del self.rooms[room.name]
+                return True
+            return False
+
+    def all_rooms(self):
+        with self.lock:
+            return list(self.rooms.values())
+
+    def all_clients(self):
+        return [conn for room in self.all_rooms() for conn in room.clients]
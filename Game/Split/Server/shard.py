@@ -0,0 +1,213 @@
+# Сервер на нескольких процессах: комнаты распределяются по рабочим процессам,
+# чтобы игры не делили одно ядро из-за GIL (только Linux/Unix).
+# Главный процесс принимает подключения, читает рукопожатие и по таблице маршрутов
+# передаёт сокет (сам файловый дескриптор) процессу, который ведёт комнату игрока.
+# Все игроки одной комнаты всегда попадают в один процесс.
+#
+# Запуск: python shard.py --workers 4 --host 0.0.0.0 --port 12345 --engine asyncio
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import struct
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from protocol import parse_handshake
+from headless import HeadlessServer
+from rooms import DEFAULT_ROOM
+from recording import RECORD_FILE
+import metrics
+import aio_server
+
+HANDSHAKE_TIMEOUT = 5  # Сколько ждать рукопожатия, прежде чем бросить соединение
+# Сообщение рабочего процесса главному: комната опустела и удалена.
+# Сколько подключений она приняла за всё время, дальше - название в UTF-8
+ROOM_CLOSED = struct.Struct(">I")
+
+
+class WorkerServer(HeadlessServer):
+    # Комнаты рабочего процесса ведёт сервер без окна: раунды, слова, очки
+    def __init__(self, index, engine):
+        # Каждый процесс пишет игру в свой файл: один файл на несколько писателей испортится
+        super().__init__(engine, record=f"{RECORD_FILE}.{index}" if RECORD_FILE else "")
+        self.index = index
+        self.channel = None
+
+    def show_message(self, message):
+        print(f"[процесс {self.index}] {message}", flush=True)
+
+    def room_closed(self, room):
+        # Главный процесс снимет маршрут комнаты, и её можно будет отдать менее занятому процессу
+        try:
+            self.channel.send(ROOM_CLOSED.pack(room.joined) + room.name.encode())
+        except OSError as e:
+            self.log(room, f"Не удалось сообщить о закрытии комнаты: {e}")
+
+    def serve_handoff(self, channel):
+        # Принимаем сокеты игроков от главного процесса вместо accept()
+        self.channel = channel
+        self.running = True
+        self.start_rounds()
+        metrics.start(worker=self.index)
+        if self.engine == "asyncio":
+            asyncio.run(self.serve_handoff_async(channel))
+            return
+        while self.running:
+            handoff = receive_socket(channel)
+            if handoff is None:
+                break
+            client_socket, handshake = handoff
+            nickname, room_name, compression, _, relay = parse_handshake(handshake)
+            # Живого канала у рабочих процессов нет: порт UDP один, а комнаты разнесены по процессам
+            self.accept_client(client_socket, client_socket.getpeername(), nickname, room_name, compression,
+                               relay=relay)
+
+    async def serve_handoff_async(self, channel):
+        loop = asyncio.get_running_loop()
+        self.aio_loop = loop
+        self.aio_stopped = asyncio.Event()
+        channel.setblocking(False)
+
+        def on_readable():
+            try:
+                handoff = receive_socket(channel)
+            except BlockingIOError:
+                return
+            if handoff is None:
+                self.aio_stopped.set()  # Главный процесс завершился
+                return
+            loop.create_task(start_connection(*handoff))
+
+        async def start_connection(client_socket, handshake):
+            client_socket.setblocking(False)
+            reader, writer = await asyncio.open_connection(sock=client_socket)
+            await aio_server.handle_connection(self, reader, writer, handshake)
+
+        loop.add_reader(channel.fileno(), on_readable)
+        await self.aio_stopped.wait()
+        loop.remove_reader(channel.fileno())
+
+
+def receive_socket(channel):
+    # Одно сообщение SOCK_SEQPACKET = рукопожатие игрока + дескриптор его сокета
+    handshake, fds, _, _ = socket.recv_fds(channel, 4096, 1)
+    if not fds:
+        return None
+    return socket.socket(fileno=fds[0]), handshake
+
+
+def run_worker(index, channel, engine, inherited):
+    # Закрываем унаследованные при fork концы каналов других процессов:
+    # иначе они не узнают, что главный процесс завершился
+    for other in inherited:
+        other.close()
+    server = WorkerServer(index, engine)
+    server.serve_handoff(channel)
+    server.stop()
+
+
+class Front:
+    def __init__(self, workers, engine):
+        self.channels = []
+        self.processes = []
+        for index in range(workers):
+            parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            inherited = self.channels + [parent_end]
+            process = multiprocessing.Process(target=run_worker, args=(index, child_end, engine, inherited), daemon=True)
+            process.start()
+            child_end.close()
+            self.channels.append(parent_end)
+            self.processes.append(process)
+        # Таблица маршрутов: комната -> [номер процесса, сколько подключений ему отдано].
+        # Новую комнату отдаём процессу, у которого меньше всего открытых комнат. Маршрут держится,
+        # пока комната открыта в процессе: снимаем его, когда процесс сообщил, что комната
+        # опустела, и все отданные ей подключения до него дошли (иначе кто-то ещё в пути).
+        self.routes = {}
+        self.rooms_per_worker = [0] * workers
+        self.lock = threading.Lock()
+        for index, channel in enumerate(self.channels):
+            threading.Thread(target=self.watch_worker, args=(index, channel), daemon=True).start()
+
+    def route(self, room_name):
+        with self.lock:
+            route = self.routes.get(room_name)
+            if route is None:
+                index = min(range(len(self.channels)), key=self.rooms_per_worker.__getitem__)
+                route = self.routes[room_name] = [index, 0]
+                self.rooms_per_worker[index] += 1
+            route[1] += 1
+            return route[0]
+
+    def watch_worker(self, index, channel):
+        # Сообщения рабочего процесса о закрытых комнатах; пустое - процесс завершился
+        while True:
+            try:
+                message = channel.recv(4096)
+            except OSError:
+                return
+            if not message:
+                return
+            joined, = ROOM_CLOSED.unpack_from(message)
+            self.room_closed(index, message[ROOM_CLOSED.size:].decode(), joined)
+
+    def room_closed(self, index, room_name, joined):
+        with self.lock:
+            route = self.routes.get(room_name)
+            if route is None or route[0] != index:
+                return
+            route[1] -= joined
+            if route[1] <= 0:
+                del self.routes[room_name]
+                self.rooms_per_worker[index] -= 1
+
+    def serve(self, server_socket):
+        server_socket.listen(socket.SOMAXCONN)
+        while True:
+            client_socket, addr = server_socket.accept()
+            # Рукопожатие читаем в отдельном потоке, чтобы медленный клиент не держал accept
+            threading.Thread(target=self.hand_off, args=(client_socket,), daemon=True).start()
+
+    def hand_off(self, client_socket):
+        try:
+            client_socket.settimeout(HANDSHAKE_TIMEOUT)
+            handshake = client_socket.recv(1024)
+            if not handshake:
+                return
+            client_socket.settimeout(None)
+            _, room_name, _, _, _ = parse_handshake(handshake)
+            # Как RoomRegistry: без названия - комната по умолчанию, иначе она разойдётся по двум процессам
+            index = self.route(room_name.strip() or DEFAULT_ROOM)
+            socket.send_fds(self.channels[index], [handshake], [client_socket.fileno()])
+        except Exception as e:
+            print(f"Ошибка передачи соединения: {e}")
+        finally:
+            # Сокет теперь открыт в рабочем процессе, здесь копия больше не нужна
+            client_socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Игровой сервер на нескольких процессах")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--engine", choices=("threads", "asyncio"), default="asyncio")
+    args = parser.parse_args()
+
+    front = Front(args.workers, args.engine)
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind((args.host, args.port))
+    print(f"Ожидается подключение на порту {args.port}, процессов: {args.workers}", flush=True)
+    try:
+        front.serve(server_socket)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server_socket.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+# Слова для игры: банк слов из словарей в папке dictionaries (PICTIONARY_WORDS_DIR).
+# Словарь - текстовый файл <категория>.txt в UTF-8, по слову в строке; после табуляции
+# можно указать сложность 1-3 (по умолчанию 1), строки с # - комментарии.
+#
+# Словари читаются лениво: при запуске сервер только смотрит, какие файлы есть, а файл
+# категории открывается через mmap при первом слове из неё. В памяти остаются лишь смещения
+# строк, само слово читается из файла, когда его вытянули, поэтому большие словари
+# не замедляют запуск и не занимают память. Смещения сохраняются рядом со словарём
+# (<категория>.txt.idx), и при следующих запусках файл заново не просматривается.
+#
+# Слова тянутся как карты из колоды: пока колода не кончилась, слово не повторяется,
+# сколько бы комнат ни брали из неё слова. Колода на каждый выбор категории и сложности,
+# одна на процесс.
+import mmap
+import os
+import random
+import re
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+WORDS_DIR = os.environ.get("PICTIONARY_WORDS_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "dictionaries"))
+# Из какой категории и какой сложности брать слова в раундах; пусто - из всех
+WORDS_CATEGORY = os.environ.get("PICTIONARY_WORDS_CATEGORY", "")
+WORDS_DIFFICULTY = int(os.environ.get("PICTIONARY_WORDS_DIFFICULTY", "0"))
+DIFFICULTIES = (1, 2, 3)
+# Заголовок файла смещений: размер и время изменения словаря, число слов каждой сложности
+INDEX_HEADER = struct.Struct("<QQ" + "Q" * len(DIFFICULTIES))
+
+# Если словарей нет
+WORDS = ["Яблоко", "Солнце", "Море", "Гора", "Книга", "Компьютер", "Собака", "Кошка", "Дом", "Машина"]
+
+# text - как показывать, normalized - с чем сравнивать догадки (см. normalize)
+Word = namedtuple("Word", "text normalized category difficulty")
+
+NOT_LETTERS = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    # Форма для сравнения догадок: без регистра, ё как е, без пробелов и знаков препинания.
+    # Вызывается на каждое сообщение чата, поэтому одна замена регулярным выражением
+    return NOT_LETTERS.sub("", text.lower().replace("ё", "е"))
+
+
+def make_word(text, category="", difficulty=1):
+    return Word(text, normalize(text), category, difficulty)
+
+
+class Dictionary:
+    def __init__(self, path, category):
+        self.path = path
+        self.category = category
+        self.data = None  # mmap файла
+        self.offsets = None  # Сложность -> array смещений строк со словами
+        self.lock = threading.Lock()
+
+    def index(self):
+        with self.lock:
+            if self.offsets is not None:
+                return self.offsets
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                # Пустой файл отобразить нельзя
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+            key = (stat.st_size, stat.st_mtime_ns)
+            self.offsets = self.load_index(key)
+            if self.offsets is None:
+                self.offsets = self.scan(stat.st_size)
+                self.save_index(key)
+            return self.offsets
+
+    def load_index(self, key):
+        try:
+            with open(self.path + ".idx", "rb") as f:
+                header = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                if header[:2] != key:
+                    return None  # Словарь изменился
+                offsets = {}
+                for difficulty, count in zip(DIFFICULTIES, header[2:]):
+                    offsets[difficulty] = array("Q")
+                    offsets[difficulty].fromfile(f, count)
+                return offsets
+        except (OSError, struct.error, EOFError):
+            return None
+
+    def save_index(self, key):
+        # Не получилось (папка только для чтения) - просмотрим словарь и в следующий раз
+        try:
+            with open(self.path + ".idx.tmp", "wb") as f:
+                f.write(INDEX_HEADER.pack(*key, *(len(self.offsets[level]) for level in DIFFICULTIES)))
+                for level in DIFFICULTIES:
+                    self.offsets[level].tofile(f)
+            os.replace(self.path + ".idx.tmp", self.path + ".idx")
+        except OSError:
+            pass
+
+    def scan(self, size):
+        # Один проход по файлу: смещения строк со словами по сложности
+        offsets = {difficulty: array("Q") for difficulty in DIFFICULTIES}
+        data = self.data
+        position = 0
+        while position < size:
+            end = data.find(b"\n", position)
+            if end < 0:
+                end = size
+            line = data[position:end].strip()
+            if line and not line.startswith(b"#"):
+                _, _, level = line.partition(b"\t")
+                difficulty = int(level) if level.strip().isdigit() else 1
+                offsets[min(max(difficulty, DIFFICULTIES[0]), DIFFICULTIES[-1])].append(position)
+            position = end + 1
+        return offsets
+
+    def word(self, offset, difficulty):
+        end = self.data.find(b"\n", offset)
+        line = self.data[offset:end if end >= 0 else len(self.data)]
+        return make_word(line.partition(b"\t")[0].decode("utf-8").strip(), self.category, difficulty)
+
+
+class Deck:
+    # Колода из нескольких источников: [(число слов, функция номер -> Word)].
+    # Перемешивание Фишера-Йетса по шагу на каждое слово: слово - O(1), без повторов до конца колоды
+    def __init__(self, sources):
+        self.sources = sources
+        self.starts = []
+        self.size = 0
+        for count, _ in sources:
+            self.starts.append(self.size)
+            self.size += count
+        self.order = array("L", range(self.size))
+        self.remaining = self.size
+
+    def draw(self):
+        if self.remaining == 0:
+            self.remaining = self.size  # Все слова вышли - новый круг
+        i = random.randrange(self.remaining)
+        self.remaining -= 1
+        order = self.order
+        order[i], order[self.remaining] = order[self.remaining], order[i]
+        number = order[self.remaining]
+        source = bisect_right(self.starts, number) - 1
+        return self.sources[source][1](number - self.starts[source])
+
+
+class WordBank:
+    def __init__(self, directory=WORDS_DIR):
+        self.directory = directory
+        self.dictionaries = None  # Категория -> Dictionary, заполняется при первом обращении
+        self.decks = {}  # (категория, сложность) -> Deck
+        self.lock = threading.Lock()
+
+    def categories(self):
+        with self.lock:
+            return sorted(self.find_dictionaries())
+
+    def find_dictionaries(self):
+        # Вызывается под self.lock
+        if self.dictionaries is None:
+            self.dictionaries = {}
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                names = []
+            for name in names:
+                category, extension = os.path.splitext(name)
+                if extension == ".txt":
+                    self.dictionaries[category] = Dictionary(os.path.join(self.directory, name), category)
+        return self.dictionaries
+
+    def deck(self, category, difficulty):
+        # Вызывается под self.lock
+        deck = self.decks.get((category, difficulty))
+        if deck is not None:
+            return deck
+        dictionaries = self.find_dictionaries()
+        if category and category not in dictionaries:
+            raise ValueError(f"Нет словаря для категории: {category}")
+        sources = []
+        for name in sorted(dictionaries) if not category else [category]:
+            dictionary = dictionaries[name]
+            for level, offsets in dictionary.index().items():
+                if offsets and difficulty in (0, level):
+                    sources.append((len(offsets), lambda i, d=dictionary, o=offsets, l=level: d.word(o[i], l)))
+        if not sources and not dictionaries:
+            sources.append((len(WORDS), lambda i: make_word(WORDS[i])))
+        if not sources:
+            raise ValueError(f"Нет слов: категория {category or 'любая'}, сложность {difficulty or 'любая'}")
+        deck = self.decks[(category, difficulty)] = Deck(sources)
+        return deck
+
+    def draw(self, category=WORDS_CATEGORY, difficulty=WORDS_DIFFICULTY):
+        # category "" и difficulty 0 - любые
+        with self.lock:
+            return self.deck(category, difficulty).draw()
+
+
+# Один банк на процесс: слова не повторяются во всех комнатах сервера
+BANK = WordBank()
+
+
+def random_word(category=WORDS_CATEGORY, difficulty=WORDS_DIFFICULTY):
+    return BANK.draw(category, difficulty)
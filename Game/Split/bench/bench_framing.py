@@ -0,0 +1,83 @@
+# Микробенчмарк кодека кадров: старый recvall со склейкой bytes против FrameReader.
+# Запуск: python bench_framing.py [--frames N] [--size БАЙТ ...] [--rcvbuf БАЙТ]
+# --rcvbuf уменьшает буфер приёма, чтобы recv, как в реальной сети, возвращал данные по кусочкам
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from framing import FrameReader, pack_frame, send_frame
+
+
+def recvall(sock, n):
+    # Так кадры читались раньше: данные копятся склейкой bytes
+    data = b''
+    while len(data) < n:
+        packet = sock.recv(n - len(data))
+        if not packet:
+            return None
+        data += packet
+    return data
+
+
+def read_old(sock, count):
+    for _ in range(count):
+        recvall(sock, 1)
+        length = int.from_bytes(recvall(sock, 4), 'big')
+        recvall(sock, length)
+
+
+def read_new(sock, count):
+    reader = FrameReader(sock)
+    for _ in range(count):
+        reader.read_frame()
+
+
+def send_old(sock, payload, count):
+    for _ in range(count):
+        sock.sendall(b'I' + len(payload).to_bytes(4, 'big') + payload)
+
+
+def send_new(sock, payload, count):
+    frame = pack_frame(b'I', payload)
+    for _ in range(count):
+        send_frame(sock, frame)
+
+
+def run(sender, receiver, payload, count, rcvbuf):
+    left, right = socket.socketpair()
+    if rcvbuf:
+        right.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        left.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, rcvbuf)
+    thread = threading.Thread(target=sender, args=(left, payload, count))
+    started = time.perf_counter()
+    thread.start()
+    receiver(right, count)
+    thread.join()
+    elapsed = time.perf_counter() - started
+    left.close()
+    right.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение старого и нового чтения/записи кадров")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--size", type=int, nargs="+", default=[64, 4 * 1024, 64 * 1024, 512 * 1024])
+    parser.add_argument("--rcvbuf", type=int, default=0)
+    args = parser.parse_args()
+    for size in args.size:
+        payload = os.urandom(size)
+        count = max(10, args.frames * 64 * 1024 // max(size, 64 * 1024))
+        old = run(send_old, read_old, payload, count, args.rcvbuf)
+        new = run(send_new, read_new, payload, count, args.rcvbuf)
+        mb = size * count / 1024 / 1024
+        print(f"{size:>8} байт x {count:>6}: recvall {count / old:>10.0f} кадров/с {mb / old:>8.1f} МБ/с | "
+              f"FrameReader {count / new:>10.0f} кадров/с {mb / new:>8.1f} МБ/с | x{old / new:.2f}")
+
+
+if __name__ == '__main__':
+    main()
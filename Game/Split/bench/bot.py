@@ -0,0 +1,142 @@
+# Бот-игрок без окна: говорит тем же протоколом, что ClientThread (рукопожатие, кадры T/I/S/D, сжатие).
+# Когда сервер даёт ему слово, бот рисует - шлёт штрихи с отметкой времени,
+# иначе пишет в чат и иногда пытается отгадать. Всё, что бот получает, считается в Stats:
+# задержку штрихов и сообщений чата (от отправки до разбора у получателя), кадры и байты.
+# Боты работают в одном цикле asyncio, поэтому сотни ботов - это один поток.
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+from framing import HEADER, frame_bytes, pack_frame, check_length
+from protocol import TEXT, STROKE, CAPS, make_handshake, pack_text, encode_stroke, decode_stroke, parse_capabilities
+from compression import FrameCodec, SUPPORTED
+from words import WORDS
+
+CHAT_MARK = "bench "  # Сообщения чата с отметкой времени: "bench <время отправки>"
+
+
+class Stats:
+    def __init__(self):
+        self.stroke_latency = []  # Секунды от отправки штриха до разбора у каждого получателя
+        self.chat_latency = []
+        self.frames = Counter()  # Тип кадра -> сколько получено
+        self.bytes = 0  # Сколько байт получено (как пришло по сети, со сжатием)
+        self.sent_strokes = 0
+        self.sent_messages = 0
+        self.connected = 0
+        self.errors = 0
+
+    def reset(self):
+        # После разгона считаем заново, соединения остаются
+        connected = self.connected
+        self.__init__()
+        self.connected = connected
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Bot:
+    def __init__(self, nickname, room, stats, stroke_rate=30, chat_rate=0.5, guess_ratio=0.05, compression=True):
+        self.nickname = nickname
+        self.room = room
+        self.stats = stats
+        self.stroke_rate = stroke_rate  # Штрихов в секунду, пока бот рисует
+        self.chat_rate = chat_rate  # Сообщений чата в секунду, пока бот отгадывает
+        self.guess_ratio = guess_ratio  # Доля сообщений чата, которые - попытка отгадать
+        self.compression = compression
+        self.codec = FrameCodec()
+        self.drawing = False
+        self.writer = None
+        self.welcomed = asyncio.Event()
+
+    async def run(self, host, port, until):
+        reader, self.writer = await asyncio.open_connection(host, port)
+        self.writer.write(make_handshake(self.nickname, self.room, SUPPORTED if self.compression else ()))
+        self.stats.connected += 1
+        read_task = asyncio.create_task(self.read_loop(reader))
+        try:
+            # Рукопожатие идёт без заголовка кадра: пока сервер его не прочитал (ответил приветствием),
+            # ничего не шлём, иначе кадр склеится с рукопожатием
+            await asyncio.wait_for(self.welcomed.wait(), max(until - time.monotonic(), 0.1))
+            await self.act_loop(until)
+        finally:
+            read_task.cancel()
+            self.writer.close()
+            self.stats.connected -= 1
+
+    async def read_loop(self, reader):
+        try:
+            while True:
+                frame_type, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+                check_length(length)
+                payload = await reader.readexactly(length)
+                self.frame_received(frame_type, payload, HEADER.size + length)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats.errors += 1
+            print(f"{self.nickname}: ошибка чтения: {e}")
+
+    def frame_received(self, frame_type, payload, size):
+        now = time.monotonic()
+        frame_type, payload = self.codec.decode(frame_type, payload)
+        self.stats.frames[frame_type] += 1
+        self.stats.bytes += size
+        if frame_type == CAPS:
+            self.codec.enable(parse_capabilities(payload))
+        elif frame_type == TEXT:
+            self.text_received(bytes(payload).decode(), now)
+        elif frame_type == STROKE:
+            sent_at = decode_stroke(payload).get("t")
+            if sent_at is not None:
+                self.stats.stroke_latency.append(now - sent_at)
+
+    def text_received(self, text, now):
+        self.welcomed.set()
+        if text.startswith("Ваше слово: "):
+            self.drawing = True
+        elif text.startswith("Новый раунд!") or text.startswith("Загаданное слово:"):
+            self.drawing = False
+        else:
+            _, _, message = text.partition(": ")
+            if message.startswith(CHAT_MARK):
+                self.stats.chat_latency.append(now - float(message[len(CHAT_MARK):]))
+
+    async def act_loop(self, until):
+        x, y = random.randint(0, 999), random.randint(0, 699)
+        next_message = time.monotonic()
+        while time.monotonic() < until:
+            if self.drawing:
+                # Отрезок пера от прошлой точки; "t" - время отправки, сервер пересылает штрих как есть
+                nx, ny = min(max(x + random.randint(-20, 20), 0), 999), min(max(y + random.randint(-20, 20), 0), 699)
+                self.send(pack_frame(STROKE, encode_stroke({"k": "pen", "c": "#000000", "w": 5,
+                                                            "p": [x, y, nx, ny], "t": time.monotonic()})))
+                x, y = nx, ny
+                self.stats.sent_strokes += 1
+                await asyncio.sleep(1 / self.stroke_rate)
+            elif self.chat_rate > 0 and time.monotonic() >= next_message:
+                if random.random() < self.guess_ratio:
+                    self.send(pack_text(random.choice(WORDS)))
+                else:
+                    self.send(pack_text(f"{CHAT_MARK}{time.monotonic()}"))
+                self.stats.sent_messages += 1
+                next_message = time.monotonic() + random.expovariate(self.chat_rate)
+            else:
+                # Короткие паузы, чтобы не пропустить начало своего раунда
+                await asyncio.sleep(0.05)
+            await self.writer.drain()
+
+    def send(self, frame):
+        self.writer.write(frame_bytes(self.codec.encode(frame)))
@@ -0,0 +1,188 @@
+# Нагрузочный тест сервера на localhost: N ботов (bot.py) по комнатам, в каждой комнате
+# сервер выбирает, кто рисует, остальные пишут в чат и отгадывают.
+# В конце - задержка штрихов и чата (p50/p99), сообщения и байты в секунду, CPU и память сервера.
+#
+# Запуск: python loadgen.py --bots 50 --rooms 5 --duration 20
+# По умолчанию сам запускает сервер без окна (Server/headless.py) на свободном порту;
+# --port N - подключиться к уже запущенному серверу (--server-pid - чей CPU и память мерить;
+# считаются и дочерние процессы, например процессы комнат у shard.py).
+# Штрихи от игроков принимает только сервер без окна (headless.py, shard.py): у окна ведущего рисует ведущий.
+# --replay game.rec - вместо ботов повторить записанную игру (Server/recording.py, replay.py),
+# --speed 10 - в десять раз быстрее, --start 300 - с пятой минуты записи.
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from bot import Bot, Stats, percentile
+from replay import load_bots
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server', 'headless.py')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, engine, round_seconds):
+    process = subprocess.Popen([sys.executable, SERVER, "--host", "127.0.0.1", "--port", str(port),
+                                "--engine", engine, "--round-seconds", str(round_seconds)],
+                               stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Сервер не запустился")
+
+
+def read_stat(pid):
+    # Поля /proc/<pid>/stat после имени процесса: [1] - родитель, [11], [12] - utime, stime
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().rsplit(")", 1)[1].split()
+
+
+def process_tree(pid):
+    # Сам процесс и все его потомки: у shard.py комнаты работают в дочерних процессах
+    children = {}
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            try:
+                children.setdefault(int(read_stat(name)[1]), []).append(int(name))
+            except OSError:
+                pass  # Процесс уже завершился
+    tree = []
+    stack = [pid]
+    while stack:
+        pid = stack.pop()
+        tree.append(pid)
+        stack.extend(children.get(pid, ()))
+    return tree
+
+
+def single_usage(pid):
+    fields = read_stat(pid)
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+    memory = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                name, value = line.split(":")
+                memory[name] = int(value.split()[0]) / 1024
+    return cpu, memory.get("VmRSS", 0.0), memory.get("VmHWM", 0.0)
+
+
+def process_usage(pid):
+    # (секунды CPU, RSS в МБ, пик RSS в МБ) из /proc - только Linux; сумма по процессу и его потомкам.
+    # Пик - сумма пиков процессов, то есть оценка сверху. CPU завершившегося потомка уже не виден
+    try:
+        usage = single_usage(pid)
+        tree = process_tree(pid)
+    except OSError:
+        return None
+    for child in tree[1:]:
+        try:
+            usage = tuple(total + value for total, value in zip(usage, single_usage(child)))
+        except OSError:
+            pass
+    return usage
+
+
+async def run_bots(args, port, stats, pid):
+    started = time.monotonic()
+    until = started + args.warmup + args.duration
+    if args.replay:
+        # Боты из записи сами ждут своего момента подключения
+        bots = load_bots(args.replay, stats, args.speed, args.start, not args.no_compression)
+        args.bots = len(bots)
+        args.rooms = len({bot.room for bot in bots})
+        tasks = [asyncio.create_task(bot.run("127.0.0.1", port, until)) for bot in bots]
+    else:
+        bots = [Bot(f"bot{i}", f"bench{i % args.rooms}", stats, args.stroke_rate, args.chat_rate,
+                    args.guess_ratio, not args.no_compression) for i in range(args.bots)]
+        tasks = []
+        for bot in bots:
+            tasks.append(asyncio.create_task(bot.run("127.0.0.1", port, until)))
+            await asyncio.sleep(args.connect_interval)
+    # Разгон: все подключились, раунды начались - дальше считаем с нуля
+    await asyncio.sleep(max(0.0, started + args.warmup - time.monotonic()))
+    stats.reset()
+    usage = process_usage(pid) if pid else None
+    measured_at = time.monotonic()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    errors = [result for result in results if isinstance(result, Exception)]
+    return time.monotonic() - measured_at, errors, usage
+
+
+def report(args, stats, elapsed, errors, usage_before, usage_after):
+    ms = 1000
+    frames = sum(stats.frames.values())
+    print(f"Ботов: {args.bots}, комнат: {args.rooms}, замер: {elapsed:.1f} с, сжатие: {not args.no_compression}")
+    if args.replay:
+        # Отметки времени в записанных кадрах - из времени записи, задержку по ним не посчитать
+        print(f"Повтор {args.replay} x{args.speed:g}: отправлено штрихов {stats.sent_strokes}, "
+              f"сообщений {stats.sent_messages}")
+    else:
+        print(f"Штрихи: отправлено {stats.sent_strokes}, получено {len(stats.stroke_latency)}, задержка "
+              f"p50 {percentile(stats.stroke_latency, 0.5) * ms:.1f} мс, p99 {percentile(stats.stroke_latency, 0.99) * ms:.1f} мс")
+        print(f"Чат: отправлено {stats.sent_messages}, получено {len(stats.chat_latency)}, задержка "
+              f"p50 {percentile(stats.chat_latency, 0.5) * ms:.1f} мс, p99 {percentile(stats.chat_latency, 0.99) * ms:.1f} мс")
+    by_type = ", ".join(f"{frame_type.decode()}: {count}" for frame_type, count in sorted(stats.frames.items()))
+    print(f"Получено: {frames / elapsed:.0f} кадров/с, {stats.bytes / elapsed / 1024:.1f} КБ/с ({by_type})")
+    if usage_before and usage_after:
+        cpu = (usage_after[0] - usage_before[0]) / elapsed * 100
+        print(f"Сервер: CPU {cpu:.0f}%, RSS {usage_after[1]:.1f} МБ (пик {usage_after[2]:.1f} МБ)")
+    if stats.errors or errors:
+        print(f"Ошибок: {stats.errors + len(errors)} {errors[:3]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера ботами")
+    parser.add_argument("--bots", type=int, default=50)
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=20, help="секунд замера")
+    parser.add_argument("--warmup", type=float, default=8, help="секунд на подключение и начало раундов")
+    parser.add_argument("--stroke-rate", type=float, default=30, help="штрихов в секунду у рисующего")
+    parser.add_argument("--chat-rate", type=float, default=0.5, help="сообщений в секунду у каждого отгадывающего")
+    parser.add_argument("--guess-ratio", type=float, default=0.05)
+    parser.add_argument("--connect-interval", type=float, default=0.005)
+    parser.add_argument("--no-compression", action="store_true")
+    parser.add_argument("--engine", choices=("threads", "asyncio"), default="asyncio")
+    parser.add_argument("--round-seconds", type=int, default=60)
+    parser.add_argument("--port", type=int, help="подключиться к уже запущенному серверу")
+    parser.add_argument("--server-pid", type=int)
+    parser.add_argument("--replay", help="повторить запись игры вместо ботов")
+    parser.add_argument("--speed", type=float, default=1.0, help="во сколько раз быстрее записи")
+    parser.add_argument("--start", type=float, default=0.0, help="с какой секунды записи начинать")
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+    pid = args.server_pid
+    if port is None:
+        port = free_port()
+        server = start_server(port, args.engine, args.round_seconds)
+        pid = server.pid
+    stats = Stats()
+    try:
+        # CPU сервера считаем с конца разгона
+        elapsed, errors, usage_before = asyncio.run(run_bots(args, port, stats, pid))
+        usage_after = process_usage(pid) if pid else None
+        report(args, stats, elapsed, errors, usage_before, usage_after)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
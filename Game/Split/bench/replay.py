@@ -0,0 +1,75 @@
+# Нагрузка из записи игры (Server/recording.py): каждое соединение из записи становится ботом,
+# который подключается в ту же комнату и шлёт те же кадры (чат, догадки, штрихи) в том же порядке,
+# только быстрее реального времени в speed раз. Используется из loadgen.py (--replay).
+#
+# Штрихи сервер принимает только от того, кто рисует в этом раунде, а раунды при повторе
+# идут заново, поэтому дойдёт лишь часть записанных штрихов - чат и догадки доходят все.
+import asyncio
+import time
+
+from bot import Bot
+from framing import HEADER, pack_frame
+from protocol import TEXT, parse_handshake
+from recording import Recording, HANDSHAKE, CLIENT_FRAME, DISCONNECT
+
+
+class ReplayBot(Bot):
+    def __init__(self, nickname, room, stats, compression, connected_at, speed):
+        super().__init__(nickname, room, stats, compression=compression)
+        self.connected_at = connected_at  # Секунд от начала повтора до подключения по записи
+        self.speed = speed
+        self.frames = []  # (секунд от подключения по записи, кадр)
+        self.duration = None  # Когда по записи отключиться; None - до конца теста
+
+    async def run(self, host, port, until):
+        await asyncio.sleep(self.connected_at / self.speed)
+        if time.monotonic() < until:
+            await super().run(host, port, until)
+
+    async def act_loop(self, until):
+        started = time.monotonic()
+        for at, frame in self.frames:
+            wait = started + at / self.speed - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if time.monotonic() >= until:
+                return
+            self.send(frame)
+            if frame[0][:1] == TEXT:
+                self.stats.sent_messages += 1
+            else:
+                self.stats.sent_strokes += 1
+            await self.writer.drain()
+        end = until if self.duration is None else min(until, started + self.duration / self.speed)
+        await asyncio.sleep(max(0.0, end - time.monotonic()))
+
+
+def load_bots(path, stats, speed=1.0, start=0.0, compression=True):
+    # Боты по записи; start - с какой секунды записи начинать
+    recording = Recording(path)
+    first = recording.start_time()
+    bots = {}
+    relays = set()  # Ретрансляторы (relay.py) не играют - их не повторяем
+    if first is None:
+        return []
+    for record in recording.records_from(first + start):
+        offset = record.time - first - start
+        if record.conn in relays:
+            continue
+        if record.kind == HANDSHAKE:
+            nickname, room, _, _, relay = parse_handshake(record.data)
+            if relay:
+                relays.add(record.conn)
+                continue
+            bots[record.conn] = ReplayBot(nickname, room, stats, compression, offset, speed)
+        elif record.kind == CLIENT_FRAME or record.conn in bots:
+            bot = bots.get(record.conn)
+            if bot is None:
+                # Подключился раньше start: рукопожатие осталось позади, ник берём по номеру соединения
+                bot = bots[record.conn] = ReplayBot(f"player{record.conn}", record.room, stats, compression, 0.0, speed)
+            if record.kind == CLIENT_FRAME:
+                frame_type, _ = HEADER.unpack_from(record.data)
+                bot.frames.append((offset - bot.connected_at, pack_frame(frame_type, record.data[HEADER.size:])))
+            elif record.kind == DISCONNECT:
+                bot.duration = offset - bot.connected_at
+    return list(bots.values())
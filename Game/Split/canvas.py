@@ -0,0 +1,181 @@
+# Холст на чистом Python (без Qt): повторяет штрихи и сохраняет картинку в PNG.
+# Нужен серверу без окна (headless.py), где нет QImage и QPainter.
+# Рисует приближённо (толстая линия - это квадраты "кисти" вдоль отрезка),
+# но для снимка холста, который получают игроки, этого хватает.
+#
+# Здесь же размеры холста, общие для сервера и клиента. Логическое разрешение - то,
+# в котором координаты штрихов и курсора у всех; от размеров окон оно не зависит,
+# окна только растягивают холст при отрисовке. Картинки холста (кадры I, D, G) могут
+# ходить по сети в меньшем разрешении: PICTIONARY_NETWORK_SCALE=0.5 - вчетверо меньше пикселей.
+# Оба размера сервер сообщает игроку в ответ на рукопожатие (кадр V).
+import math
+import os
+import struct
+import zlib
+
+CANVAS_WIDTH = 1000
+CANVAS_HEIGHT = 700
+NETWORK_SCALE = min(max(float(os.environ.get("PICTIONARY_NETWORK_SCALE", "1")), 0.1), 1.0)
+WHITE = b'\xff\xff\xff'
+
+
+def network_size(scale=NETWORK_SCALE):
+    return max(round(CANVAS_WIDTH * scale), 1), max(round(CANVAS_HEIGHT * scale), 1)
+
+
+def scale_stroke(stroke, sx, sy):
+    # Штрих из логических координат в холст другого размера
+    if sx == 1 and sy == 1 or stroke["k"] == "clear":
+        return stroke
+    scaled = dict(stroke)
+    if "p" in stroke:
+        scaled["p"] = [round(value * (sx if i % 2 == 0 else sy)) for i, value in enumerate(stroke["p"])]
+    if "r" in stroke:
+        x, y, w, h = stroke["r"]
+        scaled["r"] = [round(x * sx), round(y * sy), round(w * sx), round(h * sy)]
+    # Толщину округляем вверх от половины: тонкая линия пропадает при уменьшении заметнее толстой
+    scaled["w"] = max(int(stroke["w"] * (sx + sy) / 2 + 0.5), 1)
+    return scaled
+
+
+def parse_color(color):
+    # "#rrggbb" -> 3 байта RGB
+    return bytes.fromhex(color.lstrip('#')[:6])
+
+
+def _png_chunk(kind, data):
+    chunk = kind + data
+    return struct.pack('>I', len(data)) + chunk + struct.pack('>I', zlib.crc32(chunk))
+
+
+class Canvas:
+    def __init__(self, width=CANVAS_WIDTH, height=CANVAS_HEIGHT, logical=None):
+        self.width = width
+        self.height = height
+        # Во сколько раз холст меньше логического, в котором приходят штрихи
+        logical_width, logical_height = logical or (width, height)
+        self.scale = (width / logical_width, height / logical_height)
+        self.pixels = bytearray(WHITE * (width * height))
+
+    def clear(self):
+        self.pixels[:] = WHITE * (self.width * self.height)
+
+    def fill_rect(self, x0, y0, x1, y1, color):
+        # Закрашивает прямоугольник [x0, x1) x [y0, y1), обрезая его по краям холста
+        x0, x1 = max(x0, 0), min(x1, self.width)
+        y0, y1 = max(y0, 0), min(y1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        row = color * (x1 - x0)
+        stride = self.width * 3
+        for y in range(y0, y1):
+            start = y * stride + x0 * 3
+            self.pixels[start:start + len(row)] = row
+
+    def stamp(self, x, y, width, color):
+        # Квадратная кисть толщиной width с центром в (x, y)
+        half = width // 2
+        self.fill_rect(x - half, y - half, x - half + max(width, 1), y - half + max(width, 1), color)
+
+    def line(self, x0, y0, x1, y1, width, color):
+        # Брезенхем: кисть ставится в каждую точку отрезка. Сначала обрезаем отрезок
+        # по холсту (с запасом на кисть), чтобы не шагать по точкам далеко за его краем
+        clipped = self.clip(x0, y0, x1, y1, width // 2 + 1)
+        if clipped is None:
+            return
+        x0, y0, x1, y1 = clipped
+        dx, dy = abs(x1 - x0), -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        error = dx + dy
+        while True:
+            self.stamp(x0, y0, width, color)
+            if x0 == x1 and y0 == y1:
+                return
+            doubled = 2 * error
+            if doubled >= dy:
+                error += dy
+                x0 += sx
+            if doubled <= dx:
+                error += dx
+                y0 += sy
+
+    def clip(self, x0, y0, x1, y1, margin):
+        # Лян-Барски: часть отрезка внутри холста, расширенного на margin; None - весь снаружи.
+        # Отрезок целиком внутри возвращается как есть
+        dx, dy = x1 - x0, y1 - y0
+        t0, t1 = 0.0, 1.0
+        for p, q in ((-dx, x0 + margin), (dx, self.width - 1 + margin - x0),
+                     (-dy, y0 + margin), (dy, self.height - 1 + margin - y0)):
+            if p == 0:
+                if q < 0:
+                    return None
+                continue
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+        if t0 > t1:
+            return None
+        if t0 == 0.0 and t1 == 1.0:
+            return x0, y0, x1, y1
+        return round(x0 + t0 * dx), round(y0 + t0 * dy), round(x0 + t1 * dx), round(y0 + t1 * dy)
+
+    def polyline(self, flat, width, color, closed=False):
+        points = [(flat[i], flat[i + 1]) for i in range(0, len(flat) - 1, 2)]
+        if closed and points:
+            points.append(points[0])
+        if len(points) == 1:
+            self.stamp(points[0][0], points[0][1], width, color)
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            self.line(x0, y0, x1, y1, width, color)
+
+    def ellipse(self, x, y, w, h, width, color):
+        rx, ry = w / 2, h / 2
+        cx, cy = x + rx, y + ry
+        margin = width // 2 + 1
+        if (max(x, x + w) < -margin or min(x, x + w) > self.width + margin
+                or max(y, y + h) < -margin or min(y, y + h) > self.height + margin):
+            return  # Весь контур за краем холста
+        # Шагов столько, чтобы соседние точки контура касались друг друга, но не больше,
+        # чем нужно эллипсу размером с холст: больших штрихи не бывают (protocol.decode_stroke)
+        steps = min(max(int(2 * math.pi * max(abs(rx), abs(ry))), 8), 4 * (self.width + self.height))
+        for i in range(steps):
+            angle = 2 * math.pi * i / steps
+            self.stamp(round(cx + rx * math.cos(angle)), round(cy + ry * math.sin(angle)), width, color)
+
+    def apply(self, stroke):
+        # Тот же формат штрихов, что у strokes.paint_stroke
+        stroke = scale_stroke(stroke, *self.scale)
+        kind = stroke["k"]
+        if kind == "clear":
+            self.clear()
+            return
+        color = WHITE if kind == "eraser" else parse_color(stroke["c"])
+        width = stroke["w"]
+        if kind in ("pen", "eraser"):
+            self.polyline(stroke["p"], width, color)
+        elif kind == "circle":
+            self.ellipse(*stroke["r"], width, color)
+        elif kind == "square":
+            x, y, w, h = stroke["r"]
+            self.polyline([x, y, x + w, y, x + w, y + h, x, y + h], width, color, closed=True)
+        elif kind == "right_triangle":
+            self.polyline(stroke["p"], width, color, closed=True)
+
+    def snapshot(self):
+        # Копия пикселей, чтобы кодировать PNG, не держа холст (см. encode_rgb_png)
+        return self.width, self.height, bytes(self.pixels)
+
+
+def encode_rgb_png(width, height, pixels):
+    # PNG RGB 8 бит; перед каждой строкой байт фильтра 0 (без фильтра)
+    stride = width * 3
+    raw = bytearray()
+    for y in range(height):
+        raw += b'\x00'
+        raw += pixels[y * stride:(y + 1) * stride]
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', header)
+            + _png_chunk(b'IDAT', zlib.compress(bytes(raw), 6)) + _png_chunk(b'IEND', b''))
@@ -0,0 +1,96 @@
+# Сжатие кадров. О сжатии договариваются при рукопожатии: клиент перечисляет,
+# что умеет ("Сжатие: zlib,zlib-stream"), сервер отвечает кадром C с тем, что принял.
+# Сжатый кадр помечается старшим битом байта типа (типы - ASCII, он у них всегда 0),
+# первый байт данных сжатого кадра - способ сжатия. Несжатые кадры (и клиенты,
+# которые про сжатие не знают) работают как раньше.
+#
+# "zlib" - каждый кадр сжимается отдельно;
+# "zlib-stream" - текст и штрихи сжимаются одним потоком zlib на соединение: словарём
+# служит вся прошлая переписка, поэтому даже короткие сообщения чата ужимаются в разы.
+import os
+import zlib
+
+from framing import HEADER, MAX_FRAME, frame_bytes, frame_size, pack_frame
+from protocol import TEXT, STROKE, CAPS
+
+ZLIB = "zlib"
+ZLIB_STREAM = "zlib-stream"
+SUPPORTED = (ZLIB, ZLIB_STREAM)
+
+COMPRESSED = 0x80  # Флаг сжатого кадра в байте типа
+# Способ сжатия (первый байт данных сжатого кадра)
+METHOD_ZLIB = b'\x00'  # Кадр сжат zlib отдельно от других
+METHOD_STREAM = b'\x01'  # Очередной кусок потока zlib этого соединения
+
+# Что разрешено сжимать серверу (пустая строка - ничего)
+SERVER_COMPRESSION = [name for name in os.environ.get("PICTIONARY_COMPRESSION", ",".join(SUPPORTED)).split(",")
+                      if name in SUPPORTED]
+# Кадры меньше порога не сжимаем: выигрыш меньше заголовка zlib
+COMPRESS_MIN = int(os.environ.get("PICTIONARY_COMPRESS_MIN", "64"))
+COMPRESS_LEVEL = 6
+# Через поток пропускаем только то, что повторяется: текст и штрихи
+STREAM_TYPES = (TEXT, STROKE)
+
+
+def negotiate(offered, allowed=None):
+    # Из предложенного клиентом оставляем то, что разрешено на сервере
+    allowed = SERVER_COMPRESSION if allowed is None else allowed
+    return [name for name in offered if name in allowed]
+
+
+class FrameCodec:
+    # Сжатие и распаковка кадров одного соединения (по одному кодеку на каждую сторону).
+    # encode вызывается только из одного потока отправки, decode - из одного потока чтения:
+    # у потока zlib есть состояние, и кадры должны идти в том же порядке, что сжимались
+    def __init__(self, capabilities=()):
+        self.capabilities = ()
+        self.compressor = None
+        self.decompressor = zlib.decompressobj()
+        self.enable(capabilities)
+
+    def enable(self, capabilities):
+        self.capabilities = tuple(capabilities)
+        if ZLIB_STREAM in self.capabilities and self.compressor is None:
+            self.compressor = zlib.compressobj(COMPRESS_LEVEL)
+
+    def encode(self, frame):
+        if not self.capabilities or frame_size(frame) - HEADER.size < COMPRESS_MIN:
+            return frame
+        frame_type = frame[0][:1]
+        if frame_type == CAPS:
+            return frame
+        data = frame_bytes(frame)[HEADER.size:]
+        if self.compressor and frame_type in STREAM_TYPES:
+            # В поток отданные данные уже не вернуть: отправляем сжатое, даже если вышло длиннее
+            packed = self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            method = METHOD_STREAM
+        elif ZLIB in self.capabilities:
+            packed = zlib.compress(data, COMPRESS_LEVEL)
+            if len(packed) + 1 >= len(data):
+                return frame  # Уже сжатое (PNG) повторно не ужимается
+            method = METHOD_ZLIB
+        else:
+            return frame
+        return pack_frame(bytes([frame_type[0] | COMPRESSED]), packed, prefix=method)
+
+    def decode(self, frame_type, payload):
+        # Возвращает (тип без флага, данные); несжатые данные отдаются как есть.
+        # Распаковываем не больше MAX_FRAME: маленький кадр может раздуться в гигабайты
+        if not frame_type[0] & COMPRESSED:
+            return frame_type, payload
+        frame_type = bytes([frame_type[0] & ~COMPRESSED])
+        method, packed = payload[:1], payload[1:]
+        if method == METHOD_STREAM:
+            decompressor = self.decompressor
+        elif method == METHOD_ZLIB:
+            decompressor = zlib.decompressobj()
+        else:
+            raise ValueError(f"Неизвестный способ сжатия: {bytes(method)!r}")
+        try:
+            data = decompressor.decompress(packed, MAX_FRAME)
+        except zlib.error as e:
+            raise ValueError(f"Битый сжатый кадр: {e}")
+        if decompressor.unconsumed_tail:
+            # Ошибка протокола: соединение закрывается, поток zlib дальше всё равно не разобрать
+            raise ValueError("Сжатый кадр больше допустимого")
+        return frame_type, data
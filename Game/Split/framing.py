@@ -0,0 +1,128 @@
+# Кодек кадров: 1 байт типа + 4 байта длины (big-endian) + данные.
+# Кадр для отправки - это кортеж кусков (заголовок, данные): данные не склеиваются
+# с заголовком и не копируются, один и тот же кадр можно раздать всем клиентам.
+# При чтении данные попадают сразу в заранее выделенный буфер (recv_into),
+# а полезная нагрузка отдаётся как memoryview без копирования.
+import socket
+import struct
+
+HEADER = struct.Struct('>cI')
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')  # На Windows sendmsg нет
+# Маленькие кадры дешевле склеить и отправить одним sendall, чем собирать список для sendmsg
+SMALL_FRAME = 16 * 1024
+# Самый большой кадр, который принимаем (и до которого распаковываем сжатый, см. compression.py).
+# Весь холст картинкой - пара мегабайт. Длину из заголовка проверяем до того, как выделить
+# под кадр память: иначе один заголовок с длиной в гигабайты занимает гигабайты
+MAX_FRAME = 16 * 1024 * 1024
+
+
+def check_length(length):
+    # Кадр длиннее MAX_FRAME - ошибка протокола, соединение закрывается
+    if length > MAX_FRAME:
+        raise ValueError(f"Слишком большой кадр: {length} байт")
+
+
+def pack_frame(frame_type, payload, prefix=b''):
+    # prefix - служебные байты в начале данных (например, координаты куска холста)
+    return (HEADER.pack(frame_type, len(prefix) + len(payload)) + prefix, payload)
+
+
+def frame_size(frame):
+    return sum(len(part) for part in frame)
+
+
+def frame_bytes(frame):
+    # Для тех мест, где всё-таки нужен один кусок (запись в файл, тесты)
+    return b''.join(frame)
+
+
+def send_frame(sock, frame):
+    send_frames(sock, [frame])
+
+
+def send_frames(sock, frames):
+    # Несколько кадров подряд одной записью: очередь клиента отдаёт накопившиеся сообщения
+    # пачкой, а не системным вызовом на каждое
+    if sum(frame_size(frame) for frame in frames) <= SMALL_FRAME:
+        sock.sendall(b''.join(part for frame in frames for part in frame))
+        return
+    if not HAS_SENDMSG:
+        for frame in frames:
+            for part in frame:
+                sock.sendall(part)
+        return
+    parts = [memoryview(part) for frame in frames for part in frame if len(part)]
+    first = 0
+    while first < len(parts):
+        # Заголовки и данные всех кадров уходят одним системным вызовом (как writev)
+        sent = sock.sendmsg(parts[first:])
+        while sent:
+            if sent >= len(parts[first]):
+                sent -= len(parts[first])
+                first += 1
+            else:
+                parts[first] = parts[first][sent:]
+                sent = 0
+
+
+class FrameReader:
+    def __init__(self, sock, buffer_size=64 * 1024):
+        self.sock = sock
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # Начало ещё не разобранных данных
+        self.end = 0  # Конец прочитанных данных
+
+    def read_frame(self):
+        # Возвращает (тип, данные) или None, если соединение закрыто.
+        # Данные - memoryview на внутренний буфер, он действителен только до следующего вызова
+        while True:
+            available = self.end - self.start
+            need = HEADER.size
+            if available >= HEADER.size:
+                frame_type, length = HEADER.unpack_from(self.buffer, self.start)
+                check_length(length)
+                need += length
+                if available >= need:
+                    payload = self.view[self.start + HEADER.size:self.start + need]
+                    self.start += need
+                    return frame_type, payload
+                if length > len(self.buffer) // 2:
+                    payload = self.read_large(length)
+                    return None if payload is None else (frame_type, payload)
+            self.make_room(need)
+            received = self.sock.recv_into(self.view[self.end:])
+            if not received:
+                return None
+            self.end += received
+
+    def read_large(self, length):
+        # Большой кадр (картинка) читаем сразу в отдельный буфер нужного размера,
+        # чтобы не гонять его по основному буферу
+        payload = bytearray(length)
+        view = memoryview(payload)
+        got = self.end - self.start - HEADER.size
+        view[:got] = self.view[self.start + HEADER.size:self.end]
+        self.start = self.end = 0
+        while got < length:
+            received = self.sock.recv_into(view[got:])
+            if not received:
+                return None
+            got += received
+        return view
+
+    def make_room(self, need):
+        if self.start + need <= len(self.buffer):
+            return
+        available = self.end - self.start
+        if need > len(self.buffer):
+            # Кадр больше буфера - выделяем новый (старый может быть занят выданными memoryview)
+            buffer = bytearray(max(need, 2 * len(self.buffer)))
+            buffer[:available] = self.view[self.start:self.end]
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+        else:
+            # Сдвигаем недочитанный хвост в начало буфера (куски перекрываются - копируем через bytes)
+            self.buffer[:available] = bytes(self.view[self.start:self.end])
+        self.start = 0
+        self.end = available
@@ -0,0 +1,75 @@
+# Картинки холста с палитрой (PICTIONARY_CANVAS_ENCODING=indexed).
+# В рисунке всего несколько цветов из выбора цвета и белый, поэтому вместо PNG в 32 бита
+# на пиксель шлём байт на пиксель - номер цвета в палитре комнаты, - сжатый zlib:
+# длинные одноцветные строки сжимаются в разы лучше, и кодирование в разы быстрее PNG.
+#
+# Палитра комнаты только растёт: цвета добавляются, когда ими рисуют, номера не меняются.
+# Поэтому её достаточно прислать один раз и дальше присылать заново только при новом цвете
+# (кадр PALETTE), а картинки с прежними номерами, в том числе плитки из кэша, остаются верными.
+# Картинка с палитрой идёт в тех же кадрах I, D и G, что и PNG; отличает её MAGIC.
+import struct
+import zlib
+
+from PyQt6.QtGui import QImage, QColor
+
+from framing import pack_frame
+from protocol import PALETTE
+
+MAGIC = b"\x89IX8"  # Как у PNG, первый байт не ASCII
+HEADER = struct.Struct(">4sHH")  # MAGIC, ширина, высота
+MAX_COLORS = 256
+LEVEL = 6  # Сжатие zlib: на номерах цветов уже 1-2 уровень даёт почти то же, но 6 всё ещё быстрее PNG
+
+
+class Palette:
+    # Палитра кодировщика; цвета - QRgb (0xAARRGGBB)
+    def __init__(self):
+        self.colors = [QColor("#ffffff").rgb()]
+        self.index = {self.colors[0]: 0}
+
+    def add(self, rgb):
+        # False - палитра заполнена
+        if rgb in self.index:
+            return True
+        if len(self.colors) >= MAX_COLORS:
+            return False
+        self.index[rgb] = len(self.colors)
+        self.colors.append(rgb)
+        return True
+
+    def frame(self):
+        # Кадр PALETTE: по 3 байта RGB на цвет
+        return pack_frame(PALETTE, b"".join((rgb & 0xFFFFFF).to_bytes(3, "big") for rgb in self.colors))
+
+
+def unpack_palette(payload):
+    # Таблица цветов для QImage
+    payload = bytes(payload)
+    return [0xFF000000 | int.from_bytes(payload[i:i + 3], "big") for i in range(0, len(payload) - 2, 3)]
+
+
+def is_indexed(data):
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+def encode_indexed(image, palette):
+    # Цвета, которых нет в палитре, станут ближайшими из неё - поэтому кодировщик
+    # добавляет в палитру цвета штрихов до того, как кодировать картинку с ними
+    indexed = image.convertToFormat(QImage.Format.Format_Indexed8, palette.colors)
+    width, height, stride = indexed.width(), indexed.height(), indexed.bytesPerLine()
+    bits = indexed.constBits().asstring(indexed.sizeInBytes())
+    if stride != width:
+        # Строки QImage выровнены по 4 байта, хвосты не шлём
+        bits = b"".join(bits[y * stride:y * stride + width] for y in range(height))
+    return HEADER.pack(MAGIC, width, height) + zlib.compress(bits, LEVEL)
+
+
+def decode_indexed(data, colors):
+    _, width, height = HEADER.unpack_from(data)
+    bits = zlib.decompress(data[HEADER.size:])
+    if len(bits) != width * height:
+        raise ValueError("Неверный размер картинки с палитрой")
+    image = QImage(bits, width, height, width, QImage.Format.Format_Indexed8)
+    image.setColorTable(colors + [0xFFFFFFFF] * (MAX_COLORS - len(colors)))
+    # Копия в обычном формате: и не зависит от bits, и рисуется на холст без пересчёта
+    return image.convertToFormat(QImage.Format.Format_ARGB32)
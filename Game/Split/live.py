@@ -0,0 +1,66 @@
+# Живой канал по UDP: курсор ведущего и фигура, которую он тянет, но ещё не отпустил.
+# По TCP это шло бы в одной очереди с большими картинками холста и ждало бы их, а курсор
+# нужен сейчас или никогда. Поэтому датаграммы ненадёжные и маленькие, и каждая несёт
+# всё состояние целиком: потерянную заменит следующая, а опоздавшую (номер не новее
+# последнего принятого) клиент выбрасывает.
+#
+# О канале договариваются при рукопожатии ("Живой канал: udp"). Сервер отвечает кадром LIVE:
+# порт UDP и ключ. Клиент шлёт с этим ключом датаграмму HELLO на порт сервера - так сервер
+# узнаёт его адрес - и повторяет её раз в LIVE_KEEPALIVE секунд (адрес может смениться за NAT).
+# В запись игры канал не попадает.
+import os
+import struct
+from collections import namedtuple
+
+from framing import pack_frame
+from protocol import LIVE, encode_stroke, decode_stroke
+
+# Предлагать ли канал (клиенту) и принимать ли (серверу); пусто - только TCP
+LIVE_CHANNEL = os.environ.get("PICTIONARY_LIVE", "udp")
+# Сколько раз в секунду максимум ведущий рассылает курсор
+LIVE_FPS = int(os.environ.get("PICTIONARY_LIVE_FPS", "60"))
+LIVE_KEEPALIVE = 5.0
+TOKEN_SIZE = 8
+OFFER = struct.Struct(">H8s")  # Данные кадра LIVE: порт UDP, ключ
+HELLO = b"H"  # Датаграмма клиента: HELLO + ключ
+# Датаграмма сервера: номер, x, y (-1 - курсора нет), толщина пера, цвет RGB; дальше - фигура в JSON
+STATE = struct.Struct(">IhhB3s")
+MAX_DATAGRAM = 1200  # Заведомо без фрагментации IP
+NO_CURSOR = -1
+
+LiveState = namedtuple("LiveState", "x y size color preview")
+
+
+def pack_offer(port, token):
+    return pack_frame(LIVE, OFFER.pack(port, token))
+
+
+def unpack_offer(payload):
+    return OFFER.unpack(bytes(payload))
+
+
+def pack_hello(token):
+    return HELLO + token
+
+
+def unpack_hello(data):
+    # Ключ или None, если это не HELLO
+    if len(data) != 1 + TOKEN_SIZE or data[:1] != HELLO:
+        return None
+    return bytes(data[1:])
+
+
+def pack_state(seq, state):
+    preview = encode_stroke(state.preview) if state.preview else b""
+    return STATE.pack(seq, state.x, state.y, state.size, bytes.fromhex(state.color[1:])) + preview
+
+
+def unpack_state(data):
+    seq, x, y, size, color = STATE.unpack_from(data)
+    preview = decode_stroke(data[STATE.size:]) if len(data) > STATE.size else None
+    return seq, LiveState(x, y, size, "#" + color.hex(), preview)
+
+
+def is_newer(seq, last):
+    # Номера 32-битные и ходят по кругу: новее - если впереди меньше чем на полкруга
+    return last is None or 0 < (seq - last) & 0xFFFFFFFF < 0x80000000
@@ -0,0 +1,164 @@
+# Общий протокол сервера и клиента.
+# Каждое сообщение: 1 байт типа + 4 байта длины (big-endian) + данные (см. framing.py).
+import json
+import struct
+
+from framing import HEADER, pack_frame
+from canvas import CANVAS_WIDTH, CANVAS_HEIGHT
+
+TEXT = b'T'  # Текст в UTF-8
+IMAGE = b'I'  # Весь холст в PNG
+STROKE = b'S'  # Векторный штрих/фигура в JSON
+DELTA = b'D'  # Изменившийся кусок холста: x, y (по 2 байта) + PNG куска
+CAPS = b'C'  # Ответ на рукопожатие: принятые сервером способы сжатия через запятую
+TILES = b'G'  # Изменившиеся плитки холста по хешам (см. tiles.py)
+LIVE = b'U'  # Ответ на рукопожатие: порт и ключ живого канала по UDP (см. live.py)
+PALETTE = b'P'  # Палитра картинок холста: по 3 байта RGB на цвет (см. indexed.py)
+KEYFRAME = b'K'  # Только ретрансляторам: опорный кадр журнала рисунка (см. pack_keyframe и relay.py)
+CANVAS = b'V'  # Ответ на рукопожатие: логический размер холста и размер его картинок в сети (см. canvas.py)
+
+# Виды штрихов: "pen" и "eraser" - ломаные по точкам,
+# "circle"/"square" - прямоугольник r, "right_triangle" - три точки,
+# "clear" - очистка холста
+STROKE_KINDS = ("pen", "eraser", "circle", "square", "right_triangle", "clear")
+MAX_STROKE_WIDTH = 25  # Как у ползунка толщины пера в окне ведущего
+MAX_STROKE_POINTS = 1024  # Точек в одной ломаной; ведущий длиннее не склеивает
+
+
+KEYFRAME_HEADER = struct.Struct(">BI")  # Разослать ли, сколько кадров журнала оставить (pack_keyframe)
+
+
+def make_handshake(nickname, room=None, compression=(), live="", relay=False):
+    # Рукопожатие - обычный текст: ник, (необязательно) комната, способы сжатия, которые
+    # понимает клиент (см. compression.py), живой канал (см. live.py) и то, что это
+    # ретранслятор для зрителей (см. relay.py), каждое с новой строки
+    text = f"Ник: {nickname}"
+    if room:
+        text += f"\nКомната: {room}"
+    if compression:
+        text += f"\nСжатие: {','.join(compression)}"
+    if live:
+        text += f"\nЖивой канал: {live}"
+    if relay:
+        text += "\nРетранслятор: да"
+    return text.encode()
+
+
+def parse_handshake(data):
+    # Возвращает (ник, комната, [способы сжатия], живой канал, ретранслятор ли);
+    # старые клиенты присылают только "Ник: ..." или просто ник одной строкой.
+    # Незнакомые строки пропускаем: их могут прислать клиенты новее сервера
+    nickname = ""
+    room = ""
+    compression = []
+    live = ""
+    relay = False
+    lines = data.decode().splitlines()
+    if len(lines) == 1 and not lines[0].startswith("Ник: "):
+        return lines[0], room, compression, live, relay
+    for line in lines:
+        if line.startswith("Ник: "):
+            nickname = line[len("Ник: "):]
+        elif line.startswith("Комната: "):
+            room = line[len("Комната: "):].strip()
+        elif line.startswith("Сжатие: "):
+            compression = [name.strip() for name in line[len("Сжатие: "):].split(",") if name.strip()]
+        elif line.startswith("Живой канал: "):
+            live = line[len("Живой канал: "):].strip()
+        elif line.startswith("Ретранслятор: "):
+            relay = line[len("Ретранслятор: "):].strip() == "да"
+    return nickname, room, compression, live, relay
+
+
+def pack_capabilities(names):
+    return pack_frame(CAPS, ",".join(names).encode())
+
+
+def parse_capabilities(payload):
+    return [name for name in bytes(payload).decode().split(",") if name]
+
+
+def pack_canvas_size(logical, network):
+    # Ширина и высота, по 2 байта: логические, потом сетевые
+    return pack_frame(CANVAS, struct.pack(">HHHH", *logical, *network))
+
+
+def unpack_canvas_size(payload):
+    width, height, network_width, network_height = struct.unpack(">HHHH", bytes(payload))
+    return (width, height), (network_width, network_height)
+
+
+def pack_keyframe(frame, broadcast, keep=0):
+    # Опорный кадр для ретранслятора: 1 байт (разослать ли его зрителям или только запомнить
+    # для новых), 4 байта - сколько последних кадров журнала остаются после него (они пришли,
+    # пока сервер кодировал опорный кадр), дальше сам кадр целиком.
+    # Данные кадра не копируются, как и в pack_frame
+    header, payload = frame
+    return pack_frame(KEYFRAME, payload, prefix=KEYFRAME_HEADER.pack(broadcast, keep) + header)
+
+
+def unpack_keyframe(payload):
+    # (разослать ли, сколько кадров журнала оставить, кадр)
+    broadcast, keep = KEYFRAME_HEADER.unpack_from(payload)
+    start = KEYFRAME_HEADER.size
+    return (bool(broadcast), keep,
+            (bytes(payload[start:start + HEADER.size]), bytes(payload[start + HEADER.size:])))
+
+
+def pack_text(message):
+    return pack_frame(TEXT, message.encode())
+
+
+def pack_delta(x, y, image_bytes):
+    return pack_frame(DELTA, image_bytes, prefix=x.to_bytes(2, 'big') + y.to_bytes(2, 'big'))
+
+
+def unpack_delta(payload):
+    return int.from_bytes(payload[0:2], 'big'), int.from_bytes(payload[2:4], 'big'), payload[4:]
+
+
+def encode_stroke(stroke):
+    # Компактный JSON без пробелов: отрезок пера занимает несколько десятков байт
+    return json.dumps(stroke, separators=(',', ':')).encode()
+
+
+def decode_stroke(payload):
+    # Штрих от другой стороны проверяем: сервер без окна повторяет его на своём холсте,
+    # и координаты в сотни тысяч или огромная толщина заняли бы его на секунды.
+    # Координаты прижимаем к логическому холсту, толщину - к MAX_STROKE_WIDTH
+    stroke = json.loads(bytes(payload).decode())
+    if not isinstance(stroke, dict) or stroke.get("k") not in STROKE_KINDS:
+        raise ValueError(f"Неизвестный тип штриха: {stroke.get('k') if isinstance(stroke, dict) else stroke}")
+    kind = stroke["k"]
+    if kind == "clear":
+        return stroke
+    try:
+        stroke["w"] = min(max(int(stroke["w"]), 1), MAX_STROKE_WIDTH)
+        if kind != "eraser":
+            check_color(stroke["c"])
+        if kind in ("circle", "square"):
+            x, y, w, h = stroke["r"]
+            x0, y0 = _clamp(x, CANVAS_WIDTH), _clamp(y, CANVAS_HEIGHT)
+            stroke["r"] = [x0, y0, _clamp(x + w, CANVAS_WIDTH) - x0, _clamp(y + h, CANVAS_HEIGHT) - y0]
+        else:
+            points = stroke["p"]
+            if not isinstance(points, list) or not points or len(points) % 2 or len(points) > 2 * MAX_STROKE_POINTS:
+                raise ValueError("неверное число точек")
+            stroke["p"] = [_clamp(value, CANVAS_WIDTH if i % 2 == 0 else CANVAS_HEIGHT)
+                           for i, value in enumerate(points)]
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Неверный штрих {kind}: {e}")
+    return stroke
+
+
+def _clamp(value, limit):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"координата {value!r}")
+    return int(min(max(value, 0), limit))
+
+
+def check_color(color):
+    # "#rrggbb"; другие строки не пропускаем - их не разберёт ни QColor, ни canvas.parse_color
+    if not isinstance(color, str) or len(color) != 7 or color[0] != "#":
+        raise ValueError(f"цвет {color!r}")
+    int(color[1:], 16)
@@ -0,0 +1,53 @@
+# Отрисовка векторных штрихов на QImage.
+# Используется и сервером (рисует сам), и клиентом (повторяет штрихи сервера),
+# поэтому картинка у всех получается одинаковой.
+from PyQt6.QtCore import Qt, QPoint, QRect
+from PyQt6.QtGui import QColor, QPainter, QPen, QPolygon
+
+
+def _polygon(flat):
+    return QPolygon([QPoint(flat[i], flat[i + 1]) for i in range(0, len(flat) - 1, 2)])
+
+
+def stroke_rect(stroke, image):
+    # Область холста, которую задевает штрих (с запасом на толщину пера)
+    kind = stroke["k"]
+    if kind == "clear":
+        return image.rect()
+    if kind in ("circle", "square"):
+        rect = QRect(*stroke["r"]).normalized()
+    else:
+        rect = _polygon(stroke["p"]).boundingRect()
+    margin = stroke["w"] // 2 + 2
+    return rect.adjusted(-margin, -margin, margin, margin).intersected(image.rect())
+
+
+def paint_stroke(image, stroke):
+    if stroke["k"] == "clear":
+        image.fill(Qt.GlobalColor.white)
+        return
+    painter = QPainter(image)
+    draw_stroke(painter, stroke)
+    painter.end()
+
+
+def draw_stroke(painter, stroke):
+    # Штрих уже открытым painter; так же рисуются и фигуры-заготовки поверх холста (live.py)
+    kind = stroke["k"]
+    color = QColor(Qt.GlobalColor.white) if kind == "eraser" else QColor(stroke["c"])
+    painter.setPen(QPen(color, stroke["w"]))
+    if kind in ("pen", "eraser"):
+        points = _polygon(stroke["p"])
+        if points.size() == 1:
+            painter.drawPoint(points.point(0))
+        else:
+            # Отрезками, а не ломаной: ведущий рисует линию по отрезку на каждое движение мыши,
+            # а у ломаной толстым пером другие стыки
+            for i in range(points.size() - 1):
+                painter.drawLine(points.point(i), points.point(i + 1))
+    elif kind == "circle":
+        painter.drawEllipse(QRect(*stroke["r"]))
+    elif kind == "square":
+        painter.drawRect(QRect(*stroke["r"]))
+    elif kind == "right_triangle":
+        painter.drawPolygon(_polygon(stroke["p"]))
@@ -0,0 +1,79 @@
+# Рассылка холста плитками (PICTIONARY_BROADCAST=tiles).
+# Холст делится на плитки TILE_SIZE x TILE_SIZE, у каждой - хеш содержимого.
+# Сервер шлёт только изменившиеся плитки, и картинку плитки - только если такой хеш в комнате
+# ещё не встречался, иначе лишь ссылку на хеш. Клиент держит картинки по хешу в кэше LRU,
+# поэтому белые плитки после очистки, стёртые ластиком места и повторы между раундами
+# стоят 14 байт вместо PNG. Плитку, которой нет в кэше, клиент просит у сервера (тем же типом
+# кадра: от клиента в нём только хеши), сервер хранит картинки плиток комнаты в таком же LRU.
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+
+from framing import pack_frame
+from protocol import TILES
+
+TILE_SIZE = 64
+HASH_SIZE = 8
+# Столбец, строка, хеш, длина PNG (0 - только ссылка на хеш)
+ENTRY = struct.Struct(">BB8sI")
+# Столбец и строка у плиток в ответе на запрос: картинка только для кэша
+NO_POSITION = 0xFF
+# Сколько плиток держать в кэше: у клиента картинки (64x64x4 - 16 КБ каждая), у сервера PNG
+CLIENT_CACHE_TILES = 1024
+SERVER_STORE_TILES = 4096
+
+
+def tile_hash(width, height, pixels):
+    # Размер входит в хеш: крайние плитки холста меньше, а белые пиксели у них те же
+    return hashlib.blake2b(pixels, digest_size=HASH_SIZE, salt=struct.pack(">HH", width, height)).digest()
+
+
+def pack_tiles(entries):
+    # entries - [(столбец, строка, хеш, PNG или b"")]
+    return pack_frame(TILES, b"".join(ENTRY.pack(col, row, digest, len(data)) + data
+                                      for col, row, digest, data in entries))
+
+
+def unpack_tiles(payload):
+    # Плитки по порядку: (столбец, строка, хеш, PNG или пустой кусок)
+    offset = 0
+    while offset < len(payload):
+        col, row, digest, length = ENTRY.unpack_from(payload, offset)
+        offset += ENTRY.size
+        yield col, row, digest, payload[offset:offset + length]
+        offset += length
+
+
+def pack_tile_request(digests):
+    return pack_frame(TILES, b"".join(digests))
+
+
+def unpack_tile_request(payload):
+    return [bytes(payload[i:i + HASH_SIZE]) for i in range(0, len(payload) - HASH_SIZE + 1, HASH_SIZE)]
+
+
+class TileCache:
+    # LRU по хешу; общий для потоков, поэтому под блокировкой
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, digest):
+        with self.lock:
+            value = self.items.get(digest)
+            if value is not None:
+                self.items.move_to_end(digest)
+            return value
+
+    def put(self, digest, value):
+        with self.lock:
+            self.items[digest] = value
+            self.items.move_to_end(digest)
+            while len(self.items) > self.capacity:
+                self.items.popitem(last=False)
+
+    def __contains__(self, digest):
+        with self.lock:
+            return digest in self.items